@@ -3,15 +3,43 @@ Web application for answering user questions with citation-backed responses
 using web search and AI.
 """
 
+import json
 import streamlit as st
 import time
 import re
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from typing import Dict, List, Optional, cast
-from src.search import search_web
-from src.scrape import scrape_page
-from src.llm import generate_answer
-from src.telemetry import track_telemetry
-from src.quality_check import validate_citations
+from src.answer_cache import get_answer_cache
+from src.metrics import get_registry, start_exporters
+from src.page_cache import get_page_cache
+from src.pipeline import (
+    PIPELINE_MAX_SOURCES,
+    PIPELINE_MIN_SOURCES,
+    QuestionPipeline,
+)
+from src.search import SEARCH_REGION
+from src.search_cache import get_search_cache
+from src.tracing import to_chrome_trace
+
+
+def style_citations(text: str, num_sources: Optional[int] = None) -> str:
+    """
+    Wrap [n] citation markers in styled spans.
+
+    Only markers up to num_sources are styled when it is given; a marker that
+    is still being streamed (e.g. "[1") is left as plain text.
+    """
+    def replace(match: re.Match) -> str:
+        citation_num = int(match.group(1))
+        if num_sources is not None and not 1 <= citation_num <= num_sources:
+            return match.group(0)
+        return f"<span class='citation'>{match.group(0)}</span>"
+
+    return re.sub(r"\[(\d+)\]", replace, text)
+
+
+# Serve /metrics and/or write the metrics file when configured
+start_exporters()
 
 # Set page configuration
 st.set_page_config(
@@ -247,8 +275,31 @@ with st.sidebar:
         "Show Citation Quality Check",
         value=st.session_state.show_quality_check
     )
+    search_region = st.text_input(
+        "Search Region",
+        value=SEARCH_REGION,
+        max_chars=2,
+        help="Country code of the search results, e.g. ke or us",
+    )
+    num_results = st.slider(
+        "Search Results Scraped", 1, 20, PIPELINE_MAX_SOURCES,
+        help="More results make slow or empty sites cheaper to skip",
+    )
+    num_sources = st.slider(
+        "Sources Used", 1, 10, PIPELINE_MIN_SOURCES,
+        help="The first pages with usable content are kept",
+    )
     if st.button("Clear Cache"):
-        st.cache_data.clear()
+        # In-memory answers and search results are dropped; the persistent
+        # page cache only loses expired entries, since fresh ones are
+        # revalidated on their own.
+        answer_cache = get_answer_cache()
+        if answer_cache is not None:
+            answer_cache.clear()
+        get_search_cache().clear()
+        page_cache = get_page_cache()
+        if page_cache:
+            page_cache.purge_expired()
         st.rerun()
 
 # Main content - use a container for better layout
@@ -285,134 +336,73 @@ with main_container:
 # Results section
 if submit and question:
     try:
-        start_time = time.time()
-
         # Progress bar with steps
         progress_text = "Operation in progress. Please wait."
         progress_bar = st.progress(0, text=progress_text)
+        st.session_state.quality_score = None  # Reset to avoid stale data
 
-        # Search
-        progress_bar.progress(10, text="Searching the web...")
-        search_results = search_web(question)
-        st.session_state.search_results = search_results
+        # Placeholders keep the badge above the answer while it streams in
+        badge_placeholder = st.empty()
+        answer_placeholder = st.empty()
+
+        def render_answer(text: str, num_sources: Optional[int] = None):
+            """Render the (partial) answer with styled citations."""
+            with answer_placeholder.container():
+                st.markdown("### Answer")
+                st.markdown(
+                    f"<div class='answer-container'>"
+                    f"{style_citations(text, num_sources)}</div>",
+                    unsafe_allow_html=True
+                )
+
+        # Search, scrape, generate and validate with overlapping stages
+        pipeline = QuestionPipeline(
+            max_sources=num_results,
+            min_sources=num_sources,
+            region=search_region.strip().lower() or SEARCH_REGION,
+            on_progress=lambda percent, text: progress_bar.progress(
+                percent, text=text
+            ),
+            on_answer_chunk=render_answer,
+            # Validation runs in the background, and only when it is shown
+            validate=st.session_state.show_quality_check,
+        )
+        result = pipeline.run_sync(question)
+        st.session_state.search_results = result["search_results"]
 
-        if not search_results:
+        if not result["search_results"]:
             st.error(
                 "No search results found. Please try a different question."
             )
             st.stop()
 
-        # Limit search results to 5
-        search_results = search_results[:5]
-
-        # Scrape content from each source
-        progress_bar.progress(30, text="Scraping content from sources...")
-        scraped_texts: Dict[str, Optional[str]] = {}
-        for source in search_results:
-            scraped_texts[source["url"]] = scrape_page(source["url"])
+        search_results = result["sources"]
+        scraped_texts: Dict[str, str] = result["scraped_texts"]
         st.session_state.scraped_texts = scraped_texts
+        answer = result["answer"]
+        sources_md = result["sources_md"]
+        quality_job = result["quality_results"]
+        telemetry_job = result["telemetry"]
 
-        # Generate answer
-        progress_bar.progress(
-            50, text="Analyzing sources and generating answer..."
-        )
-        answer, sources_md = generate_answer(question, search_results)
-
-        # Run quality check
-        progress_bar.progress(80, text="Validating citation quality...")
-        st.session_state.quality_score = None  # Reset to avoid stale data
-        # Convert scraped_texts to Dict[str, str] by replacing None with ""
-        scraped_texts_non_null = {
-            k: v if v is not None else "" for k, v in scraped_texts.items()
-        }
-        quality_results = validate_citations(
-            answer, search_results, scraped_texts_non_null
-        )
-
-        # Recompute quality score based on unique citations in the answer
-        actual_citations = sorted(
-            set(re.findall(r"\[\d+\]", answer)),
-            key=lambda x: int(x.strip("[]"))
-        )
-        total_citations = len(actual_citations)
-        valid_citations = 0
-        seen_citations = set()
-        for citation in quality_results["citations"]:
-            for detail in citation["details"]:
-                citation_num = detail["citation_num"]
-                citation_marker = f"[{citation_num}]"
-                if (
-                    citation_marker in actual_citations
-                    and detail["valid"]
-                    and citation_marker not in seen_citations
-                ):
-                    valid_citations += 1
-                    seen_citations.add(citation_marker)
-        if total_citations > 0:
-            percentage = (valid_citations / total_citations) * 100
-            if percentage >= 90:
-                quality_label = "Excellent"
-            elif percentage >= 75:
-                quality_label = "Good"
-            elif percentage >= 50:
-                quality_label = "Fair"
-            else:
-                quality_label = "Poor"
-            quality_score = (
-                f"{quality_label} ({valid_citations}/{total_citations} "
-                f"valid citations, {percentage:.1f}%)"
-            )
-        else:
-            quality_score = "No citations to evaluate"
-        st.session_state.quality_score = quality_score
-
-        # Track telemetry and calculate actual latency
-        total_time = time.time() - start_time
-        telemetry = track_telemetry(
-            question, search_results, scraped_texts_non_null, answer
-        )
-        telemetry["latency"] = total_time  # Use actual end-to-end time
-
-        progress_bar.progress(100, text="Done!")
         time.sleep(0.5)
         progress_bar.empty()
 
-        # Display quality score badge if toggle is enabled
-        if (
-            "show_quality_check" in st.session_state
-            and st.session_state.show_quality_check
-        ):
-            quality_score = st.session_state.quality_score
-            if "Excellent" in quality_score:
-                badge_class = "quality-excellent"
-            elif "Good" in quality_score:
-                badge_class = "quality-good"
-            elif "Fair" in quality_score:
-                badge_class = "quality-fair"
-            else:
-                badge_class = "quality-poor"
-            st.markdown(
-                f"<div class='quality-badge {badge_class}'>Citation Quality: "
-                f"{quality_score}</div>",
+        # The quality badge is filled in once the background check is done
+        if quality_job is not None:
+            badge_placeholder.markdown(
+                "<div class='quality-badge'>Citation Quality: checking..."
+                "</div>",
                 unsafe_allow_html=True,
             )
 
-        # Process answer for inline citation styling
-        answer_html = answer
-        for i in range(len(search_results)):
-            citation_num = i + 1
-            styled_citation = f"<span class='citation'>[{citation_num}]</span>"
-            answer_html = answer_html.replace(
-                f"[{citation_num}]", styled_citation
+        # Display the final answer in a nice container
+        render_answer(answer, len(search_results))
+        if result["cached"]:
+            st.caption(
+                f"Answer reused from {result['cached']['age']:.0f}s ago for "
+                f"\"{result['cached']['question']}\""
             )
 
-        # Display answer in a nice container
-        st.markdown("### Answer")
-        st.markdown(
-            f"<div class='answer-container'>{answer_html}</div>",
-            unsafe_allow_html=True
-        )
-
         # Format sources as a list
         st.markdown("### Sources")
         sources_md_typed: Optional[str] = cast(
@@ -440,45 +430,122 @@ if submit and question:
         else:
             st.write("No sources available.")
 
-        # Display telemetry in sidebar
-        with telemetry_container:
-            st.markdown("<div class='telemetry-card'>", unsafe_allow_html=True)
-            st.markdown(
-                f"<span class='metric-label'>Total Time:</span> "
-                f"<span class='metric-value'>{telemetry['latency']:.2f}s"
-                f"</span>",
-                unsafe_allow_html=True,
-            )
-            st.markdown(
-                f"<span class='metric-label'>Input Tokens:</span> "
-                f"<span class='metric-value'>{telemetry['input_tokens']}"
-                f"</span>",
-                unsafe_allow_html=True,
+        # Debug panel with better styling
+        with st.expander("Debug: Raw Search Results"):
+            st.json(result["search_results"])
+
+        # Per-stage timings of this question
+        with st.expander("Debug: Trace"):
+            st.json(result["trace"].to_dict(), expanded=False)
+            st.download_button(
+                "Download Chrome trace",
+                json.dumps(to_chrome_trace(result["trace"]), default=str),
+                file_name="trace.json",
+                mime="application/json",
             )
-            st.markdown(
-                f"<span class='metric-label'>Output Tokens:</span> "
-                f"<span class='metric-value'>{telemetry['output_tokens']}"
-                f"</span>",
-                unsafe_allow_html=True,
+
+        # Filled in once the background quality check is done
+        quality_placeholder = st.empty()
+
+        # Display telemetry in sidebar once the background job finishes
+        with telemetry_container:
+            try:
+                telemetry = telemetry_job.result(timeout=30)
+            except Exception as e:
+                telemetry = None
+                st.caption(f"Telemetry unavailable: {e}")
+            if telemetry is not None:
+                st.markdown(
+                    "<div class='telemetry-card'>", unsafe_allow_html=True
+                )
+                st.markdown(
+                    f"<span class='metric-label'>Total Time:</span> "
+                    f"<span class='metric-value'>{telemetry['latency']:.2f}s"
+                    f"</span>",
+                    unsafe_allow_html=True,
+                )
+                if telemetry.get("time_to_first_token") is not None:
+                    st.markdown(
+                        f"<span class='metric-label'>"
+                        f"Time to First Token:</span> "
+                        f"<span class='metric-value'>"
+                        f"{telemetry['time_to_first_token']:.2f}s</span>",
+                        unsafe_allow_html=True,
+                    )
+                if telemetry.get("client_setup_time"):
+                    st.markdown(
+                        f"<span class='metric-label'>Model Setup:</span> "
+                        f"<span class='metric-value'>"
+                        f"{telemetry['client_setup_time']:.2f}s</span>",
+                        unsafe_allow_html=True,
+                    )
+                st.markdown(
+                    f"<span class='metric-label'>Input Tokens:</span> "
+                    f"<span class='metric-value'>{telemetry['input_tokens']}"
+                    f"</span>",
+                    unsafe_allow_html=True,
+                )
+                st.markdown(
+                    f"<span class='metric-label'>Output Tokens:</span> "
+                    f"<span class='metric-value'>"
+                    f"{telemetry['output_tokens']}"
+                    f"</span>",
+                    unsafe_allow_html=True,
+                )
+                st.markdown(
+                    f"<span class='metric-label'>Total Tokens:</span> "
+                    f"<span class='metric-value'>{telemetry['total_tokens']}"
+                    f"</span>",
+                    unsafe_allow_html=True,
+                )
+                latency = get_registry().quantiles(
+                    "question_latency_seconds"
+                )
+                if latency["count"] > 1:
+                    st.markdown(
+                        f"<span class='metric-label'>"
+                        f"Latency p50/p95/p99:</span> "
+                        f"<span class='metric-value'>"
+                        f"{latency['p50']:.2f}s / {latency['p95']:.2f}s / "
+                        f"{latency['p99']:.2f}s</span>",
+                        unsafe_allow_html=True,
+                    )
+                st.markdown("</div>", unsafe_allow_html=True)
+
+        # Show the citation quality check when the background job finishes
+        quality_results = None
+        if quality_job is not None:
+            try:
+                quality_results = quality_job.result(timeout=60)
+            except FuturesTimeoutError:
+                badge_placeholder.markdown(
+                    "<div class='quality-badge'>Citation Quality: "
+                    "unavailable (check timed out)</div>",
+                    unsafe_allow_html=True,
+                )
+        if quality_results is not None:
+            # Rate unique citations; errors only have an overall score
+            quality_score = quality_results.get(
+                "citation_score", quality_results["overall_score"]
             )
-            st.markdown(
-                f"<span class='metric-label'>Total Tokens:</span> "
-                f"<span class='metric-value'>{telemetry['total_tokens']}"
-                f"</span>",
+            st.session_state.quality_score = quality_score
+
+            if "Excellent" in quality_score:
+                badge_class = "quality-excellent"
+            elif "Good" in quality_score:
+                badge_class = "quality-good"
+            elif "Fair" in quality_score:
+                badge_class = "quality-fair"
+            else:
+                badge_class = "quality-poor"
+            badge_placeholder.markdown(
+                f"<div class='quality-badge {badge_class}'>Citation Quality: "
+                f"{quality_score}</div>",
                 unsafe_allow_html=True,
             )
-            st.markdown("</div>", unsafe_allow_html=True)
-
-        # Debug panel with better styling
-        with st.expander("Debug: Raw Search Results"):
-            st.json(search_results)
-
-        # Show Citation Quality Check debug only if toggle is enabled
-        if (
-            "show_quality_check" in st.session_state
-            and st.session_state.show_quality_check
-        ):
-            with st.expander("Debug: Citation Quality Check"):
+            with quality_placeholder.expander(
+                "Debug: Citation Quality Check"
+            ):
                 st.json(quality_results)
 
     except Exception as e:
@@ -0,0 +1,305 @@
+"""
+Module providing an in-memory cache of answers keyed by normalized question.
+"""
+
+import copy
+import os
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+
+import numpy as np
+from dotenv import load_dotenv
+
+from .ranking import tokenize
+
+load_dotenv()
+
+# Seconds an answer is served from the cache, the maximum number of cached
+# answers before least recently used ones are evicted (0 disables the
+# cache), and the estimated word-shingle Jaccard similarity at which a
+# differently worded question with the same content words reuses an answer
+# (above 1 disables that).
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.8"))
+
+MINHASH_PERMUTATIONS = 128
+
+_WORD = re.compile(r"\w+")
+_ARTICLES = frozenset(("a", "an", "the"))
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)
+_HASH_A = _rng.integers(1, _PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+_HASH_B = _rng.integers(0, _PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+class CachedAnswer(NamedTuple):
+    """A cached answer and how it was found."""
+
+    result: Dict[str, Any]
+    question: str
+    similarity: float
+    stored_at: float
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalize a question so trivially different wordings share a key.
+
+    Applies Unicode compatibility normalization, lowercases, drops
+    punctuation and articles, and collapses whitespace.
+
+    Args:
+        question: The user's question
+
+    Returns:
+        str: The normalized question
+    """
+    text = unicodedata.normalize("NFKC", question).lower()
+    return " ".join(
+        word for word in _WORD.findall(text) if word not in _ARTICLES
+    )
+
+
+def shingles(normalized: str) -> Set[str]:
+    """
+    Get the word unigrams and bigrams of a normalized question.
+
+    Words rather than characters are used so that questions differing in a
+    number or a single short word ("2020" and "2023") do not look alike.
+
+    Args:
+        normalized: A question returned by normalize_question
+
+    Returns:
+        set: The shingles
+    """
+    words = normalized.split()
+    return set(words) | {
+        f"{first} {second}" for first, second in zip(words, words[1:])
+    }
+
+
+def minhash(items: Set[str]) -> np.ndarray:
+    """
+    Compute the MinHash signature of a set of shingles.
+
+    The share of equal positions in two signatures estimates the Jaccard
+    similarity of the sets.
+
+    Args:
+        items: The shingles
+
+    Returns:
+        ndarray: MINHASH_PERMUTATIONS hash minimums
+    """
+    if not items:
+        return np.full(MINHASH_PERMUTATIONS, _PRIME, dtype=np.uint64)
+    hashes = np.fromiter(
+        (zlib.crc32(item.encode("utf-8")) % _PRIME for item in items),
+        dtype=np.uint64,
+        count=len(items),
+    )
+    permuted = (np.outer(_HASH_A, hashes) + _HASH_B[:, None]) % _PRIME
+    return permuted.min(axis=1)
+
+
+def content_terms(normalized: str) -> FrozenSet[str]:
+    """
+    Get the words of a normalized question that carry its meaning.
+
+    Two questions are only near-duplicates when these are equal, so a
+    different number, name or topic word never reuses an answer however
+    long the rest of the question is.
+
+    Args:
+        normalized: A question returned by normalize_question
+
+    Returns:
+        frozenset: The words other than stopwords, numbers included
+    """
+    return frozenset(tokenize(normalized))
+
+
+def _key(question: str, scope: str) -> str:
+    return f"{scope}\n{normalize_question(question)}"
+
+
+class _Entry(NamedTuple):
+    result: Dict[str, Any]
+    question: str
+    scope: str
+    terms: FrozenSet[str]
+    signature: np.ndarray
+    stored_at: float
+
+
+class AnswerCache:
+    """
+    Thread-safe store of pipeline results keyed by normalized question.
+
+    A lookup first tries the exact normalized question and then, if the
+    similarity threshold allows it, the stored question with the same
+    content words whose MinHash signature is most similar, so only
+    differences in stopwords and word order are tolerated. Answers only
+    match within their scope, e.g. the search settings. Entries expire
+    after the TTL and the least recently used entries are evicted beyond
+    max_entries.
+    """
+
+    def __init__(
+        self,
+        ttl: float = ANSWER_CACHE_TTL,
+        max_entries: int = ANSWER_CACHE_SIZE,
+        similarity: float = ANSWER_CACHE_SIMILARITY,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def get(self, question: str, scope: str = "") -> Optional[CachedAnswer]:
+        """
+        Look up the answer to a question or a near-duplicate of it.
+
+        Args:
+            question: The user's question
+            scope: Only answers stored with the same scope match
+
+        Returns:
+            CachedAnswer with a copy of the stored result, or None
+        """
+        key = _key(question, scope)
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            similarity = 1.0
+            if key not in self._entries:
+                key, similarity = self._nearest(question, scope)
+                if key is None:
+                    return None
+            self._entries.move_to_end(key)
+            entry = self._entries[key]
+            return CachedAnswer(
+                copy.deepcopy(entry.result),
+                entry.question,
+                similarity,
+                entry.stored_at,
+            )
+
+    def put(
+        self, question: str, result: Dict[str, Any], scope: str = ""
+    ) -> None:
+        """
+        Store the result of answering a question.
+
+        Args:
+            question: The user's question
+            result: Plain data to store, e.g. the answer and its sources
+            scope: Scope of the answer, e.g. the search settings
+        """
+        if self.max_entries <= 0:
+            return
+        key = _key(question, scope)
+        normalized = normalize_question(question)
+        terms = content_terms(normalized)
+        signature = minhash(shingles(normalized))
+        with self._lock:
+            self._entries[key] = _Entry(
+                copy.deepcopy(result),
+                question,
+                scope,
+                terms,
+                signature,
+                time.time(),
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def update(self, question: str, scope: str = "", **fields: Any) -> None:
+        """
+        Add fields to a stored result, e.g. validation that finished later.
+
+        Args:
+            question: The question the result was stored under
+            scope: The scope the result was stored under
+            **fields: Result fields to set
+        """
+        key = _key(question, scope)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.result.update(copy.deepcopy(fields))
+
+    def clear(self) -> None:
+        """Delete every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _expire(self, now: float) -> None:
+        expired = [
+            key for key, entry in self._entries.items()
+            if now - entry.stored_at >= self.ttl
+        ]
+        for key in expired:
+            del self._entries[key]
+
+    def _nearest(
+        self, question: str, scope: str
+    ) -> Tuple[Optional[str], float]:
+        if self.similarity > 1:
+            return None, 0.0
+        normalized = normalize_question(question)
+        terms = content_terms(normalized)
+        keys: List[str] = [
+            key for key, entry in self._entries.items()
+            if entry.scope == scope and entry.terms == terms
+        ]
+        if not keys:
+            return None, 0.0
+        signatures = np.stack([self._entries[k].signature for k in keys])
+        signature = minhash(shingles(normalized))
+        estimates = (signatures == signature).mean(axis=1)
+        best = int(estimates.argmax())
+        if estimates[best] < self.similarity:
+            return None, float(estimates[best])
+        return keys[best], float(estimates[best])
+
+
+_answer_cache: Optional[AnswerCache] = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """
+    Get the process-wide answer cache.
+
+    Returns:
+        AnswerCache or None if ANSWER_CACHE_SIZE is 0
+    """
+    global _answer_cache
+    if _answer_cache is None and ANSWER_CACHE_SIZE > 0:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                _answer_cache = AnswerCache()
+    return _answer_cache
@@ -0,0 +1,78 @@
+"""Module to score validated citations by sentence and by unique citation."""
+
+from typing import Any, Dict, List, Set
+
+
+def rate(valid: int, total: int) -> str:
+    """
+    Turn a count of valid items into a rating with its numbers.
+
+    Args:
+        valid: Number of valid items
+        total: Number of items checked, greater than zero
+
+    Returns:
+        str: e.g. "Good (3/4 valid citations, 75.0%)"
+    """
+    score_pct = (valid / total) * 100
+    if score_pct >= 90:
+        rating = "Excellent"
+    elif score_pct >= 75:
+        rating = "Good"
+    elif score_pct >= 50:
+        rating = "Fair"
+    else:
+        rating = "Poor"
+    return f"{rating} ({valid}/{total} valid citations, {score_pct:.1f}%)"
+
+
+def score_citations(citations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Score per-sentence validation results in a single pass.
+
+    Sentences are valid when any of their citations is supported; every
+    sentence counts, including those without citations. A citation number
+    is valid when it supports at least one sentence that cites it, and each
+    number used in the answer counts once.
+
+    Args:
+        citations: The "citations" entries of validate_citations, one per
+            sentence from extract_citations, with "citations", "validation"
+            and "details"
+
+    Returns:
+        dict: "valid_sentences", "total_sentences" and "overall_score" for
+        sentences, and "valid_citations", "total_citations" and
+        "citation_score" for unique citation numbers
+    """
+    valid_sentences = 0
+    cited: Set[int] = set()
+    supported: Set[int] = set()
+    for citation in citations:
+        if citation["validation"] == "Valid":
+            valid_sentences += 1
+        cited.update(citation["citations"])
+        supported.update(
+            detail["citation_num"]
+            for detail in citation["details"]
+            if detail["valid"]
+        )
+
+    total_sentences = len(citations)
+    valid_citations = len(cited & supported)
+    return {
+        "valid_sentences": valid_sentences,
+        "total_sentences": total_sentences,
+        "overall_score": (
+            rate(valid_sentences, total_sentences)
+            if total_sentences
+            else "N/A (No citations found)"
+        ),
+        "valid_citations": valid_citations,
+        "total_citations": len(cited),
+        "citation_score": (
+            rate(valid_citations, len(cited))
+            if cited
+            else "No citations to evaluate"
+        ),
+    }
@@ -0,0 +1,54 @@
+"""Module with thread pool helpers shared by the pipeline stages."""
+
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from streamlit.runtime.scriptrunner import (
+    add_script_run_ctx,
+    get_script_run_ctx,
+)
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """Thread pool that runs every task in a copy of the submitter's context.
+
+    Context variables, such as the current tracing span, are then visible to
+    the task. This also covers loop.run_in_executor, which calls submit().
+    """
+
+    def submit(
+        self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any
+    ) -> Future:
+        ctx = contextvars.copy_context()
+        return super().submit(ctx.run, fn, *args, **kwargs)
+
+
+def context_executor(
+    max_workers: int, thread_name_prefix: str = ""
+) -> ThreadPoolExecutor:
+    """
+    Create a thread pool whose workers share the caller's Streamlit context.
+
+    Cached Streamlit functions called from the workers then behave as if they
+    ran on the script thread. Outside Streamlit this is a plain thread pool.
+    Tasks also see the context variables of the code that submitted them.
+
+    Args:
+        max_workers: Maximum number of worker threads
+        thread_name_prefix: Prefix for the worker thread names
+
+    Returns:
+        ThreadPoolExecutor: The new thread pool
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)
+
+    def _attach_ctx() -> None:
+        if ctx is not None:
+            add_script_run_ctx(ctx=ctx)
+
+    return ContextThreadPoolExecutor(
+        max_workers=max_workers,
+        thread_name_prefix=thread_name_prefix,
+        initializer=_attach_ctx,
+    )
@@ -0,0 +1,230 @@
+"""
+Module tracking the health of scraped domains with a circuit breaker.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+
+from .metrics import get_registry
+
+load_dotenv()
+
+# Consecutive failures after which a domain is skipped, seconds it is then
+# skipped for, and the longest Retry-After (in seconds) that a scrape waits
+# out instead of giving up on the page.
+DOMAIN_CIRCUIT_FAILURES = int(os.getenv("DOMAIN_CIRCUIT_FAILURES", "3"))
+DOMAIN_CIRCUIT_COOLDOWN = float(os.getenv("DOMAIN_CIRCUIT_COOLDOWN", "300"))
+SCRAPE_MAX_RETRY_AFTER = float(os.getenv("SCRAPE_MAX_RETRY_AFTER", "5"))
+
+
+def domain_of(url: str) -> str:
+    """
+    Get the domain a URL belongs to for health tracking.
+
+    Args:
+        url: The page URL
+
+    Returns:
+        str: The lowercase host name without a leading "www."
+    """
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header.
+
+    Args:
+        value: The header value, either seconds or an HTTP date
+
+    Returns:
+        float: Seconds to wait (never negative), or None if missing or
+        malformed
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+@dataclass
+class DomainStats:
+    """Counters and circuit state of one domain."""
+
+    requests: int = 0
+    failures: int = 0
+    rejections: int = 0
+    consecutive_failures: int = 0
+    latency: Optional[float] = None
+    open_until: float = 0.0
+    trial: bool = False
+
+
+class DomainHealth:
+    """
+    Thread-safe per-domain failure tracking with a circuit breaker.
+
+    After `failures` consecutive failures, or a 429 with Retry-After, the
+    circuit of the domain opens and allow() refuses it until the cool-down
+    (or the Retry-After time) has passed. The circuit is then half-open:
+    allow() lets exactly one trial request through and refuses the others
+    until it is recorded. A failure opens the circuit again, any response
+    closes it. A trial that is never recorded, e.g. because it was
+    cancelled, expires after another cool-down.
+    """
+
+    def __init__(
+        self,
+        failures: int = DOMAIN_CIRCUIT_FAILURES,
+        cooldown: float = DOMAIN_CIRCUIT_COOLDOWN,
+    ):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._domains: Dict[str, DomainStats] = {}
+
+    def _stats(self, domain: str) -> DomainStats:
+        return self._domains.setdefault(domain, DomainStats())
+
+    def allow(self, domain: str) -> bool:
+        """
+        Check whether a domain may be requested now.
+
+        Args:
+            domain: The domain, see domain_of()
+
+        Returns:
+            bool: False while the domain's circuit is open, or half-open
+            with a trial request in flight
+        """
+        now = time.time()
+        with self._lock:
+            stats = self._domains.get(domain)
+            allowed = stats is None or now >= stats.open_until
+            if allowed and stats is not None and stats.open_until:
+                # Half-open: this caller is the trial, the others wait for it
+                stats.open_until = now + self.cooldown
+                stats.trial = True
+        if not allowed:
+            get_registry().inc(
+                "domain_circuit_skips_total",
+                help_text="Requests skipped because a domain's circuit was "
+                "open",
+            )
+        return allowed
+
+    def record_success(self, domain: str, latency: float) -> None:
+        """
+        Record a successful response and close the circuit.
+
+        Args:
+            domain: The domain
+            latency: Seconds the request and download took
+        """
+        with self._lock:
+            stats = self._stats(domain)
+            stats.requests += 1
+            stats.consecutive_failures = 0
+            stats.open_until = 0.0
+            stats.trial = False
+            # Exponentially weighted, so recent requests count most
+            stats.latency = (
+                latency if stats.latency is None
+                else 0.8 * stats.latency + 0.2 * latency
+            )
+
+    def record_rejection(self, domain: str) -> None:
+        """
+        Record a response that was unusable, e.g. not HTML or a 404.
+
+        The domain answered, so this closes its circuit like a success.
+
+        Args:
+            domain: The domain
+        """
+        with self._lock:
+            stats = self._stats(domain)
+            stats.requests += 1
+            stats.rejections += 1
+            stats.consecutive_failures = 0
+            stats.open_until = 0.0
+            stats.trial = False
+
+    def record_failure(
+        self, domain: str, retry_after: Optional[float] = None
+    ) -> None:
+        """
+        Record a failed request, opening the circuit if needed.
+
+        Args:
+            domain: The domain
+            retry_after: Seconds the server asked us to wait, if any
+        """
+        now = time.time()
+        with self._lock:
+            stats = self._stats(domain)
+            stats.requests += 1
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            # A failed trial reopens the circuit
+            was_open = stats.open_until > now and not stats.trial
+            stats.trial = False
+            if stats.consecutive_failures >= self.failures:
+                stats.open_until = max(stats.open_until, now + self.cooldown)
+            if retry_after is not None:
+                stats.open_until = max(stats.open_until, now + retry_after)
+            opened = not was_open and stats.open_until > now
+        if opened:
+            print(f"Circuit opened for {domain}")
+            get_registry().inc(
+                "domain_circuit_opened_total",
+                help_text="Times a domain's circuit was opened",
+            )
+
+    def snapshot(self, domain: str) -> Dict[str, Any]:
+        """
+        Get the health of a domain.
+
+        Returns:
+            dict: Request, failure and rejection counts, the failure rate,
+            the smoothed latency in seconds (None before any success) and
+            whether the circuit is open
+        """
+        with self._lock:
+            stats = self._domains.get(domain, DomainStats())
+            return {
+                "requests": stats.requests,
+                "failures": stats.failures,
+                "rejections": stats.rejections,
+                "failure_rate": (
+                    stats.failures / stats.requests if stats.requests else 0.0
+                ),
+                "latency": stats.latency,
+                "circuit_open": time.time() < stats.open_until,
+            }
+
+
+_domain_health = DomainHealth()
+
+
+def get_domain_health() -> DomainHealth:
+    """
+    Get the process-wide domain health registry.
+
+    Returns:
+        DomainHealth: The registry
+    """
+    return _domain_health
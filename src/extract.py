@@ -0,0 +1,366 @@
+"""Module to extract the main text content from HTML pages."""
+
+import os
+import re
+from html.parser import HTMLParser
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+from bs4.builder import HTMLTreeBuilder
+from bs4.builder._htmlparser import BeautifulSoupHTMLParser
+from bs4.dammit import EntitySubstitution
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Extraction backend used by scrape_page: "stream" (single-pass tokenizer)
+# or "bs4" (BeautifulSoup tree).
+SCRAPE_EXTRACTOR = os.getenv("SCRAPE_EXTRACTOR", "stream")
+
+SKIPPED_TAGS = [
+    "script",
+    "style",
+    "nav",
+    "footer",
+    "header",
+    "aside",
+    "noscript",
+    "iframe",
+    "svg",
+    "form",
+]
+CONTENT_TAGS = ["article", "main", "div"]
+CONTENT_CLASS = re.compile(r"(content|article|post|entry|text)")
+MIN_PARAGRAPH_CHARS = 40
+
+# BeautifulSoup stores text inside these tags as special string types that
+# get_text() leaves out, so the stream extractor ignores it as well.
+_EXCLUDED_STRING_TAGS = frozenset(
+    HTMLTreeBuilder.DEFAULT_STRING_CONTAINERS
+) - frozenset(SKIPPED_TAGS)
+_VOID_TAGS = frozenset(HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS)
+
+
+def clean_text(text: str) -> str:
+    """
+    Collapse all runs of whitespace in extracted text to single spaces.
+
+    Args:
+        text: The raw extracted text
+
+    Returns:
+        str: The cleaned text
+    """
+    text = re.sub(r"\s+", " ", text)  # Replace multiple spaces with one
+    return re.sub(r"[\n\r\t]+", " ", text)  # Remove newlines and tabs
+
+
+def extract_bs4(html: str) -> str:
+    """
+    Extract main text content by building a full BeautifulSoup tree.
+
+    Args:
+        html: The page markup
+
+    Returns:
+        str: The cleaned main text content
+    """
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Remove unwanted elements
+    for element in soup(SKIPPED_TAGS):
+        element.decompose()
+
+    # Try to get main content elements
+    main_content = ""
+
+    # Try method 1: Find article or main tags
+    content_elements = soup.find_all(CONTENT_TAGS, class_=CONTENT_CLASS)
+    if content_elements:
+        for element in content_elements:
+            main_content += element.get_text(separator=" ", strip=True) + " "
+
+    # If main content sections weren't found, use paragraphs
+    if not main_content:
+        paragraphs = soup.find_all("p")
+        main_content = " ".join(
+            p.get_text(strip=True)
+            for p in paragraphs
+            if len(p.get_text(strip=True)) > MIN_PARAGRAPH_CHARS
+        )
+
+    # If still no content, try getting all text
+    if not main_content:
+        main_content = soup.get_text(separator=" ", strip=True)
+
+    return clean_text(main_content)
+
+
+class StreamExtractor(HTMLParser):
+    """
+    Single-pass main-content extractor that never builds a document tree.
+
+    Tokenizes the markup with html.parser, as BeautifulSoup does, but only
+    keeps a stack of open tag names. Text inside skipped tags is dropped as
+    it streams past, and text for content elements, paragraphs and the whole
+    page is collected at the same time so the same fallbacks as extract_bs4
+    apply and the same text is produced.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=False)
+        # Each frame is (tag name, inside a skipped tag, text is dropped,
+        # content index, paragraph index); the indices are -1 when the tag is
+        # not a content element or paragraph.
+        self._stack: List[Tuple[str, bool, bool, int, int]] = []
+        self._pending: List[str] = []
+        self._open_content: List[int] = []
+        self._open_paragraphs: List[int] = []
+        self._content: List[List[str]] = []
+        self._paragraphs: List[List[str]] = []
+        self._all_text: List[str] = []
+        # Void tags opened without "/>"; a matching end tag is swallowed.
+        self._closed_void_tags: List[str] = []
+
+    def _flush(self, cdata: bool = False) -> None:
+        """Assign buffered text to the elements that are currently open."""
+        if not self._pending:
+            return
+        text = "".join(self._pending).strip()
+        self._pending = []
+        # CDATA keeps its own string type, so only skipped tags drop it.
+        if not text or (self._stack and self._stack[-1][1 if cdata else 2]):
+            return
+        self._all_text.append(text)
+        for idx in self._open_content:
+            self._content[idx].append(text)
+        for idx in self._open_paragraphs:
+            self._paragraphs[idx].append(text)
+
+    def _push(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        self._flush()
+        parent = self._stack[-1] if self._stack else None
+        skipped = bool(parent and parent[1]) or tag in SKIPPED_TAGS
+        dropped = (
+            skipped
+            or bool(parent and parent[2])
+            or tag in _EXCLUDED_STRING_TAGS
+        )
+        content_idx = paragraph_idx = -1
+        if not skipped:
+            if tag in CONTENT_TAGS:
+                class_attr = dict(attrs).get("class") or ""
+                if CONTENT_CLASS.search(class_attr):
+                    content_idx = len(self._content)
+                    self._content.append([])
+                    self._open_content.append(content_idx)
+            elif tag == "p":
+                paragraph_idx = len(self._paragraphs)
+                self._paragraphs.append([])
+                self._open_paragraphs.append(paragraph_idx)
+        self._stack.append(
+            (tag, skipped, dropped, content_idx, paragraph_idx)
+        )
+
+    def _pop(self) -> None:
+        _, _, _, content_idx, paragraph_idx = self._stack.pop()
+        if content_idx >= 0:
+            self._open_content.remove(content_idx)
+        if paragraph_idx >= 0:
+            self._open_paragraphs.remove(paragraph_idx)
+
+    def handle_starttag(
+        self, tag: str, attrs: List[Tuple[str, Optional[str]]]
+    ) -> None:
+        if tag in _VOID_TAGS:
+            # Void elements cannot contain text; they only split strings.
+            self._flush()
+            self._closed_void_tags.append(tag)
+            return
+        self._push(tag, attrs)
+
+    def handle_startendtag(
+        self, tag: str, attrs: List[Tuple[str, Optional[str]]]
+    ) -> None:
+        # A self-closing tag such as <div/> is opened and closed at once.
+        self._push(tag, attrs)
+        self._pop()
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self._closed_void_tags:
+            # A redundant end tag such as </br> does not split the text.
+            self._closed_void_tags.remove(tag)
+            return
+        self._flush()
+        # Like BeautifulSoup, close everything up to the most recent open
+        # tag with this name and ignore end tags that were never opened.
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                while len(self._stack) > i:
+                    self._pop()
+                break
+
+    def handle_data(self, data: str) -> None:
+        self._pending.append(data)
+
+    def handle_charref(self, name: str) -> None:
+        dereferenced, _, extra_data = (
+            BeautifulSoupHTMLParser._dereference_numeric_character_reference(
+                name
+            )
+        )
+        self._pending.append(dereferenced + extra_data)
+
+    def handle_entityref(self, name: str) -> None:
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        self._pending.append(character if character is not None else f"&{name}")
+
+    def handle_comment(self, data: str) -> None:
+        self._flush()
+
+    def handle_decl(self, decl: str) -> None:
+        self._flush()
+
+    def handle_pi(self, data: str) -> None:
+        self._flush()
+
+    def unknown_decl(self, data: str) -> None:
+        self._flush()
+        if data.upper().startswith("CDATA["):
+            # CDATA sections are kept as text, as a string of their own.
+            self._pending.append(data[len("CDATA["):])
+            self._flush(cdata=True)
+
+    def has_enough(self, max_chars: int) -> bool:
+        """
+        Check whether the first max_chars of the result are already known.
+
+        Only content containers can settle the result early: their text comes
+        first and later markup can only append to it. Paragraph and whole-page
+        fallbacks need the complete document.
+
+        Args:
+            max_chars: Number of leading characters the caller will keep
+
+        Returns:
+            bool: True if more markup cannot change those characters
+        """
+        if not self._content:
+            return False
+        open_content = set(self._open_content)
+        settled = []
+        settled_len = 0
+        for idx, parts in enumerate(self._content):
+            piece = " ".join(parts)
+            settled.append(piece)
+            settled_len += len(piece) + 1
+            if idx in open_content:
+                break  # Text after this point can still change
+            if settled_len > 2 * max_chars:
+                break
+        if settled_len <= max_chars + 1:
+            return False
+        # Whitespace collapsing may shorten the text; the extra character
+        # keeps a trailing space, which could still merge, out of the prefix.
+        return len(clean_text(" ".join(settled))) > max_chars + 1
+
+    def result(self) -> str:
+        """
+        Finish parsing and build the main text content.
+
+        Returns:
+            str: The cleaned main text content
+        """
+        self.close()
+        self._flush()
+
+        if self._content:
+            main_content = "".join(
+                " ".join(parts) + " " for parts in self._content
+            )
+        else:
+            main_content = " ".join(
+                text
+                for text in ("".join(parts) for parts in self._paragraphs)
+                if len(text) > MIN_PARAGRAPH_CHARS
+            )
+            if not main_content:
+                main_content = " ".join(self._all_text)
+
+        return clean_text(main_content)
+
+
+def extract_stream(html: str) -> str:
+    """
+    Extract main text content in a single streaming pass.
+
+    Args:
+        html: The page markup
+
+    Returns:
+        str: The cleaned main text content
+    """
+    extractor = StreamExtractor()
+    extractor.feed(html)
+    return extractor.result()
+
+
+def extract_chunks(
+    chunks: Iterable[str],
+    max_chars: Optional[int] = None,
+    backend: Optional[str] = None,
+) -> str:
+    """
+    Extract main text content from markup that arrives in pieces.
+
+    With the stream backend each chunk is parsed as it arrives and iteration
+    stops as soon as the first max_chars characters of the result are settled,
+    so the rest of the page is never downloaded. Other backends collect every
+    chunk before parsing.
+
+    Args:
+        chunks: Decoded pieces of the page markup
+        max_chars: Number of leading characters the caller will keep
+        backend: Name of the extractor to use, defaults to SCRAPE_EXTRACTOR
+
+    Returns:
+        str: The cleaned main text content
+    """
+    name = backend or SCRAPE_EXTRACTOR
+    if name != "stream":
+        return extract_text("".join(chunks), name)
+
+    extractor = StreamExtractor()
+    for chunk in chunks:
+        extractor.feed(chunk)
+        if max_chars is not None and extractor.has_enough(max_chars):
+            break
+    return extractor.result()
+
+
+EXTRACTORS: Dict[str, Callable[[str], str]] = {
+    "bs4": extract_bs4,
+    "stream": extract_stream,
+}
+
+
+def extract_text(html: str, backend: Optional[str] = None) -> str:
+    """
+    Extract the main text content of a page with the configured backend.
+
+    Args:
+        html: The page markup
+        backend: Name of the extractor to use, defaults to SCRAPE_EXTRACTOR
+
+    Returns:
+        str: The cleaned main text content
+    """
+    name = backend or SCRAPE_EXTRACTOR
+    try:
+        extractor = EXTRACTORS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown extractor '{name}'. "
+            f"Choose one of: {', '.join(EXTRACTORS)}."
+        )
+    return extractor(html)
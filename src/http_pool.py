@@ -0,0 +1,164 @@
+"""
+Module providing a shared, keep-alive HTTP connection pool for outbound
+requests.
+"""
+
+import os
+import threading
+from typing import Dict, Optional
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from .metrics import get_registry
+from .tracing import span
+
+load_dotenv()
+
+# Number of per-host pools kept alive, maximum open connections per host, and
+# whether callers wait for a free connection instead of opening extra ones.
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "32"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "8"))
+HTTP_POOL_BLOCK = os.getenv("HTTP_POOL_BLOCK", "false").lower() == "true"
+HTTP_POOL_HTTP2 = os.getenv("HTTP_POOL_HTTP2", "false").lower() == "true"
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, int] = {"hits": 0, "misses": 0}
+
+
+def _record_checkout(reused: bool) -> None:
+    """Count a connection checkout as a pool hit or miss."""
+    with _stats_lock:
+        _stats["hits" if reused else "misses"] += 1
+    get_registry().inc(
+        "http_pool_checkouts_total",
+        help_text="Connection checkouts by whether a pooled one was reused",
+        reused=str(reused).lower(),
+    )
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    """HTTP connection pool that records whether connections were reused."""
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        _record_checkout(bool(getattr(conn, "is_connected", False)))
+        return conn
+
+    def _validate_conn(self, conn):
+        if not conn.is_closed:
+            return super()._validate_conn(conn)
+        # Connect up front, instead of lazily inside the request, so DNS
+        # and TCP setup show up as their own span.
+        with span("connect", host=self.host):
+            super()._validate_conn(conn)
+            conn.connect()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    """HTTPS connection pool that records whether connections were reused."""
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        _record_checkout(bool(getattr(conn, "is_connected", False)))
+        return conn
+
+    def _validate_conn(self, conn):
+        if not conn.is_closed:
+            return super()._validate_conn(conn)
+        # DNS, TCP and the TLS handshake happen here for new connections
+        with span("connect", host=self.host, tls=True):
+            super()._validate_conn(conn)
+
+
+class _PooledAdapter(HTTPAdapter):
+    """Transport adapter whose pools report hit and miss counts."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+def _enable_http2() -> None:
+    """Negotiate HTTP/2 over TLS when urllib3's h2 support is installed."""
+    try:
+        import urllib3.http2
+
+        urllib3.http2.inject_into_urllib3()
+    except ImportError as e:
+        print(f"HTTP/2 unavailable, falling back to HTTP/1.1: {e}")
+
+
+_adapter_lock = threading.Lock()
+_adapter: Optional[HTTPAdapter] = None
+_local = threading.local()
+
+
+def get_adapter() -> HTTPAdapter:
+    """
+    Get the process-wide transport adapter holding the connection pools.
+
+    The adapter is created on first use from the HTTP_POOL_* settings. Its
+    underlying urllib3 pools are thread-safe, so every session shares it.
+
+    Returns:
+        HTTPAdapter: The shared adapter
+    """
+    global _adapter
+    if _adapter is None:
+        with _adapter_lock:
+            if _adapter is None:
+                if HTTP_POOL_HTTP2:
+                    _enable_http2()
+                _adapter = _PooledAdapter(
+                    pool_connections=HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=HTTP_POOL_MAXSIZE,
+                    pool_block=HTTP_POOL_BLOCK,
+                )
+    return _adapter
+
+
+def get_session() -> requests.Session:
+    """
+    Get a keep-alive session for the calling thread.
+
+    Sessions are kept per thread because requests.Session is not guaranteed
+    to be thread-safe, but all of them share the same connection pools, so
+    connections opened by one thread are reused by the others.
+
+    Returns:
+        requests.Session: Session backed by the shared connection pools
+    """
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = get_adapter()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _local.session = session
+    return session
+
+
+def get_pool_stats() -> Dict[str, int]:
+    """
+    Get connection pool usage counters.
+
+    Returns:
+        dict: Number of checkouts that reused a live connection ("hits"),
+        that had to open a new one ("misses"), and the total ("requests")
+    """
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    return {"hits": hits, "misses": misses, "requests": hits + misses}
+
+
+def reset_pool_stats() -> None:
+    """Reset the connection pool usage counters."""
+    with _stats_lock:
+        _stats["hits"] = 0
+        _stats["misses"] = 0
@@ -2,64 +2,75 @@
 Module to generate answers using Gemini LLM based on scraped content.
 """
 
-import os
 import time
-from typing import List, Dict, Tuple, Optional
+from typing import Iterator, List, Dict, Tuple, Optional
 import google.generativeai as genai
 from dotenv import load_dotenv
-from .scrape import scrape_page
-import streamlit as st
+from .llm_clients import get_model
+from .ranking import PROMPT_TOKEN_BUDGET, PassageIndex
+from .tracing import span
 
 load_dotenv()
 
 
-@st.cache_data
-def generate_answer(
-    question: str, sources: List[Dict[str, str]]
-) -> Tuple[str, Optional[str]]:
+def _get_model() -> genai.GenerativeModel:
     """
-    Generate answer with citations using Gemini.
-
-    Args:
-        question: The user's question
-        sources: List of dictionaries containing title and url for each source
+    Get the shared Gemini model used to generate answers.
 
     Returns:
-        Tuple of (answer text with citations, markdown-formatted sources or
-        None)
+        GenerativeModel: The model used to generate answers
     """
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY not set in environment variables.")
-
-    genai.configure(api_key=api_key)
-
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
+        return get_model("answer")
+    except ValueError:
+        raise
     except Exception as e:
         print(f"Model initialization error: {e}")
         raise RuntimeError(f"Failed to initialize LLM: {str(e)}")
 
+
+def build_prompt(
+    question: str,
+    sources: List[Dict[str, str]],
+    scraped_texts: Dict[str, str],
+) -> str:
+    """
+    Build the answer prompt from the question and the scraped sources.
+
+    Each source is cut down to its passages most relevant to the question so
+    that all sources together stay within PROMPT_TOKEN_BUDGET tokens.
+
+    Args:
+        question: The user's question
+        sources: List of dictionaries containing title and url for each source
+        scraped_texts: Dictionary mapping source URLs to their scraped text
+
+    Returns:
+        str: The prompt text
+    """
+    # Keep the passages most relevant to the question within the budget
+    index = PassageIndex(
+        {s["url"]: scraped_texts.get(s["url"], "") for s in sources}
+    )
+    relevant_texts = index.select(question, PROMPT_TOKEN_BUDGET)
+
     source_texts = []
     for i, s in enumerate(sources):
-        try:
-            content = scrape_page(s["url"])
-            if content:
-                source_texts.append(
-                    f"[{i + 1}] Title: {s['title']}\n"
-                    f"URL: {s['url']}\n"
-                    f"Content: {content}"
-                )
-            else:
-                print(f"Warning: No content scraped from {s['url']}")
-        except Exception as e:
-            print(f"Error scraping {s['url']}: {e}")
+        content = relevant_texts.get(s["url"])
+        if content:
+            source_texts.append(
+                f"[{i + 1}] Title: {s['title']}\n"
+                f"URL: {s['url']}\n"
+                f"Content: {content}"
+            )
+        else:
+            print(f"Warning: No content scraped from {s['url']}")
 
     if not source_texts:
         raise ValueError("No valid content could be scraped from any sources.")
 
     # Build prompt with proper line breaks
-    prompt = (
+    return (
         f"You are a precise research assistant. Answer the question below "
         f"using ONLY the information from the provided sources.\n\n"
         f"QUESTION: {question}\n\n"
@@ -89,23 +100,105 @@ def generate_answer(
         f"...etc."
     )
 
+
+def split_sources(
+    answer_text: str, sources: List[Dict[str, str]]
+) -> Tuple[str, Optional[str]]:
+    """
+    Split the model output into the answer and its sources section.
+
+    Args:
+        answer_text: The full model output
+        sources: List of dictionaries containing title and url for each source
+
+    Returns:
+        Tuple of (answer text with citations, markdown-formatted sources or
+        None)
+    """
+    if "Sources:" in answer_text:
+        answer, sources_md = answer_text.split("Sources:", 1)
+        return answer.strip(), "Sources:" + sources_md.strip()
+
+    sources_list = "\n".join(
+        [f"[{i + 1}] {s['title']} - {s['url']}" for i, s in enumerate(sources)]
+    )
+    return answer_text.strip(), (
+        f"Sources:\n{sources_list}" if sources_list else None
+    )
+
+
+def generate_answer(
+    question: str,
+    sources: List[Dict[str, str]],
+    scraped_texts: Dict[str, str],
+) -> Tuple[str, Optional[str]]:
+    """
+    Generate answer with citations using Gemini.
+
+    Args:
+        question: The user's question
+        sources: List of dictionaries containing title and url for each source
+        scraped_texts: Dictionary mapping source URLs to their scraped text
+
+    Returns:
+        Tuple of (answer text with citations, markdown-formatted sources or
+        None)
+    """
+    with span("model_setup"):
+        model = _get_model()
+    with span("prompt"):
+        prompt = build_prompt(question, sources, scraped_texts)
+
     start_time = time.time()
     try:
-        response = model.generate_content(prompt)
-        answer_text = response.text
+        with span("llm"):
+            response = model.generate_content(prompt)
+            answer_text = response.text
         print(f"LLM response time: {time.time() - start_time:.2f}s")
+        return split_sources(answer_text, sources)
 
-        if "Sources:" in answer_text:
-            answer, sources_md = answer_text.split("Sources:", 1)
-            return answer.strip(), "Sources:" + sources_md.strip()
-        else:
-            sources_list = "\n".join(
-                [f"[{i + 1}] {s['title']} - {s['url']}"
-                 for i, s in enumerate(sources)]
-            )
-            return answer_text.strip(), (
-                f"Sources:\n{sources_list}" if sources_list else None
-            )
+    except Exception as e:
+        print(f"LLM error: {e}")
+        raise RuntimeError(f"Error generating answer: {str(e)}")
+
+
+def stream_answer(
+    question: str,
+    sources: List[Dict[str, str]],
+    scraped_texts: Dict[str, str],
+) -> Iterator[str]:
+    """
+    Generate an answer with citations, yielding text as Gemini produces it.
+
+    The concatenated chunks are the full model output, including the
+    "Sources:" section; pass it to split_sources once the stream ends.
+
+    Args:
+        question: The user's question
+        sources: List of dictionaries containing title and url for each source
+        scraped_texts: Dictionary mapping source URLs to their scraped text
+
+    Yields:
+        Chunks of the model output
+    """
+    with span("model_setup"):
+        model = _get_model()
+    with span("prompt"):
+        prompt = build_prompt(question, sources, scraped_texts)
+
+    start_time = time.time()
+    try:
+        with span("llm", stream=True) as llm_span:
+            for chunk in model.generate_content(prompt, stream=True):
+                try:
+                    text = chunk.text
+                except ValueError:
+                    continue  # Chunk without text parts, e.g. finish metadata
+                if text:
+                    if "first_chunk" not in llm_span.attrs:
+                        llm_span.set(first_chunk=llm_span.duration)
+                    yield text
+        print(f"LLM response time: {time.time() - start_time:.2f}s")
 
     except Exception as e:
         print(f"LLM error: {e}")
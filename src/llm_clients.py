@@ -0,0 +1,111 @@
+"""
+Module keeping one configured Gemini model handle per task for the process.
+"""
+
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+import google.generativeai as genai
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Model used for each task. Validation can use a cheaper model than answer
+# generation; it defaults to the answer model.
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+GEMINI_MODELS: Dict[str, str] = {
+    "answer": GEMINI_MODEL,
+    "validation": os.getenv("GEMINI_VALIDATION_MODEL", GEMINI_MODEL),
+}
+
+_lock = threading.Lock()
+_configured_key: Optional[str] = None
+_models: Dict[Tuple[str, str], genai.GenerativeModel] = {}
+_setup_times: Dict[str, float] = {}
+# Setup seconds per task paid by the current request, see track_setup_times
+_request_setup_times: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "request_setup_times", default=None
+)
+
+
+def get_model(task: str) -> genai.GenerativeModel:
+    """
+    Get the shared model handle for a task, creating it on first use.
+
+    genai.configure() drops the library's cached clients, so it is only
+    called when the API key changes. Later calls reuse the same client and
+    its gRPC channel.
+
+    Args:
+        task: The task name, a key of GEMINI_MODELS
+
+    Returns:
+        GenerativeModel: The model handle for the task
+    """
+    global _configured_key
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY not set in environment variables.")
+    model_name = GEMINI_MODELS[task]
+
+    with _lock:
+        start_time = time.time()
+        if api_key != _configured_key:
+            genai.configure(api_key=api_key)
+            _configured_key = api_key
+            _models.clear()
+
+        model = _models.get((task, model_name))
+        setup_time = 0.0
+        if model is None:
+            model = genai.GenerativeModel(model_name)
+            _models[(task, model_name)] = model
+            setup_time = time.time() - start_time
+            _setup_times[task] = _setup_times.get(task, 0.0) + setup_time
+
+    request_times = _request_setup_times.get()
+    if request_times is not None and setup_time:
+        request_times[task] = request_times.get(task, 0.0) + setup_time
+    return model
+
+
+def track_setup_times() -> Dict[str, float]:
+    """
+    Start recording the model setup paid by the current request.
+
+    Model handles created afterwards in this context add their setup seconds
+    to the returned dict, including those created on worker threads that
+    copy the context (see context_executor). Setup paid by concurrent
+    requests is not included.
+
+    Returns:
+        dict: Setup seconds per task, filled in as handles are created
+    """
+    times: Dict[str, float] = {}
+    _request_setup_times.set(times)
+    return times
+
+
+def get_setup_times() -> Dict[str, float]:
+    """
+    Get the time spent configuring clients and creating model handles.
+
+    Returns:
+        dict: Cumulative setup seconds per task for the whole process
+    """
+    with _lock:
+        return dict(_setup_times)
+
+
+def reset_models() -> None:
+    """Drop every cached model handle so the next call configures anew."""
+    global _configured_key
+
+    with _lock:
+        _configured_key = None
+        _models.clear()
+        _setup_times.clear()
@@ -0,0 +1,110 @@
+"""
+Module to decide clear-cut citations locally before LLM validation.
+"""
+
+import os
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+from .ranking import tokenize
+
+load_dotenv()
+
+# Whether clear-cut citations skip the LLM, the share of a sentence's word
+# trigrams that must appear in the source to accept it locally, and the
+# share of its content words below which it is rejected locally.
+VALIDATION_PREFILTER = (
+    os.getenv("VALIDATION_PREFILTER", "true").lower() == "true"
+)
+VALIDATION_LOCAL_SUPPORT = float(
+    os.getenv("VALIDATION_LOCAL_SUPPORT", "0.6")
+)
+VALIDATION_LOCAL_REJECT = float(os.getenv("VALIDATION_LOCAL_REJECT", "0.2"))
+
+_WORD = re.compile(r"\w+")
+_CITATION = re.compile(r"\[\d+\]")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def _trigrams(words: List[str]) -> Set[Tuple[str, str, str]]:
+    return set(zip(words, words[1:], words[2:]))
+
+
+class LocalVerifier:
+    """
+    Lexical first-pass check of (sentence, cited source) pairs.
+
+    A sentence is accepted when most of its word trigrams occur in the source
+    (near-verbatim copies) and every number in it appears there too. It is
+    rejected when hardly any of its content words occur in the source.
+    Everything in between is left to the LLM.
+    """
+
+    def __init__(
+        self,
+        texts: Dict[str, str],
+        support: float = VALIDATION_LOCAL_SUPPORT,
+        reject: float = VALIDATION_LOCAL_REJECT,
+    ):
+        """
+        Args:
+            texts: Source key (e.g. URL) to source text
+            support: Trigram overlap at or above which a pair is supported
+            reject: Content word overlap at or below which a pair is not
+        """
+        self.texts = texts
+        self.support = support
+        self.reject = reject
+        # Word trigrams, content terms and numbers of each source, built on
+        # first use
+        self._sources: Dict[str, Tuple[Set, Set[str], Set[str]]] = {}
+
+    def _source(self, key: str) -> Tuple[Set, Set[str], Set[str]]:
+        if key not in self._sources:
+            text = self.texts.get(key, "")
+            self._sources[key] = (
+                _trigrams(_WORD.findall(text.lower())),
+                set(tokenize(text)),
+                set(_NUMBER.findall(text)),
+            )
+        return self._sources[key]
+
+    def verify(self, sentence: str, key: str) -> Optional[Tuple[bool, str]]:
+        """
+        Decide a citation locally if the evidence is clear-cut.
+
+        Args:
+            sentence: The cited sentence
+            key: Key of the cited source
+
+        Returns:
+            Tuple of (supported, reason), or None if the LLM should decide
+        """
+        sentence = _CITATION.sub(" ", sentence)
+        terms = set(tokenize(sentence))
+        if not terms or not self.texts.get(key):
+            return None
+        source_trigrams, source_terms, source_numbers = self._source(key)
+
+        term_overlap = len(terms & source_terms) / len(terms)
+        if term_overlap <= self.reject:
+            return (
+                False,
+                f"Local check: only {term_overlap:.0%} of the sentence's "
+                f"key words appear in the source",
+            )
+
+        trigrams = _trigrams(_WORD.findall(sentence.lower()))
+        if not trigrams:
+            return None
+        trigram_overlap = len(trigrams & source_trigrams) / len(trigrams)
+        numbers = set(_NUMBER.findall(sentence))
+        if trigram_overlap >= self.support and numbers <= source_numbers:
+            return (
+                True,
+                f"Local check: {trigram_overlap:.0%} of the sentence's "
+                f"phrases appear verbatim in the source",
+            )
+        return None
@@ -0,0 +1,403 @@
+"""
+Module providing an in-process metrics registry with latency histograms.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from .tracing import Span
+
+load_dotenv()
+
+# Seconds of history covered by the rolling percentiles, sub-buckets per
+# power of two (32 keeps quantiles within about 2%), and the exporters:
+# a file rewritten every METRICS_EXPORT_INTERVAL seconds and an HTTP port
+# serving /metrics (both disabled when empty).
+METRICS_WINDOW = float(os.getenv("METRICS_WINDOW", "600"))
+METRICS_SUB_BUCKETS = int(os.getenv("METRICS_SUB_BUCKETS", "32"))
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+METRICS_EXPORT_INTERVAL = float(os.getenv("METRICS_EXPORT_INTERVAL", "15"))
+METRICS_PORT = os.getenv("METRICS_PORT", "")
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """
+    Sparse log-linear histogram in the style of HdrHistogram.
+
+    Each power of two is split into sub_buckets buckets, so any quantile is
+    reported within a relative error of about 1 / sub_buckets of the true
+    value, whatever the range of the recorded values. Values of zero or
+    less share one bucket.
+    """
+
+    def __init__(self, sub_buckets: int = METRICS_SUB_BUCKETS):
+        self.sub_buckets = sub_buckets
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _index(self, value: float) -> int:
+        if value <= 0:
+            return -(2**31)
+        return math.floor(math.log2(value) * self.sub_buckets)
+
+    def _value(self, index: int) -> float:
+        if index == -(2**31):
+            return 0.0
+        # Midpoint of the bucket in log space
+        return 2 ** ((index + 0.5) / self.sub_buckets)
+
+    def record(self, value: float) -> None:
+        """Add one value."""
+        index = self._index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "Histogram") -> None:
+        """Add every value recorded in another histogram."""
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile of the recorded values.
+
+        Args:
+            q: The quantile, between 0 and 1
+
+        Returns:
+            float or None if nothing was recorded
+        """
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                # Clamp so the estimate never leaves the recorded range
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+
+class RollingHistogram:
+    """
+    Histogram over a sliding time window plus an all-time total.
+
+    Values go into one histogram per interval; intervals older than the
+    window are dropped, so percentiles follow recent traffic.
+    """
+
+    def __init__(
+        self,
+        window: float = METRICS_WINDOW,
+        intervals: int = 10,
+        sub_buckets: int = METRICS_SUB_BUCKETS,
+    ):
+        self.interval = window / intervals
+        self.sub_buckets = sub_buckets
+        self.total = Histogram(sub_buckets)
+        self._intervals: Deque[Tuple[float, Histogram]] = deque(
+            maxlen=intervals
+        )
+
+    def record(self, value: float, now: Optional[float] = None) -> None:
+        """Add one value at the given (or current) time."""
+        now = time.time() if now is None else now
+        start = now - now % self.interval
+        if not self._intervals or self._intervals[-1][0] != start:
+            self._intervals.append((start, Histogram(self.sub_buckets)))
+        self._intervals[-1][1].record(value)
+        self.total.record(value)
+
+    def window(self, now: Optional[float] = None) -> Histogram:
+        """
+        Merge the intervals that are still inside the window.
+
+        Returns:
+            Histogram: The values recorded during the window
+        """
+        now = time.time() if now is None else now
+        oldest = now - self.interval * (self._intervals.maxlen or 1)
+        merged = Histogram(self.sub_buckets)
+        for start, histogram in self._intervals:
+            if start + self.interval > oldest:
+                merged.merge(histogram)
+        return merged
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    )
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class MetricsRegistry:
+    """
+    Named counters and rolling histograms, keyed by label values.
+
+    Thread safe. render_prometheus() exposes counters as Prometheus counters
+    and histograms as summaries with p50/p95/p99 over the rolling window.
+    """
+
+    def __init__(self, window: float = METRICS_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._help: Dict[str, str] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, RollingHistogram]] = {}
+
+    def inc(
+        self, name: str, amount: float = 1, help_text: str = "", **labels: str
+    ) -> None:
+        """
+        Increase a counter.
+
+        Args:
+            name: Metric name, e.g. "scrape_pages_total"
+            amount: Amount to add
+            help_text: Description shown in the export
+            **labels: Label values, e.g. result="ok"
+        """
+        key = _labels(labels)
+        with self._lock:
+            if help_text:
+                self._help.setdefault(name, help_text)
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(
+        self, name: str, value: float, help_text: str = "", **labels: str
+    ) -> None:
+        """
+        Record a value in a histogram.
+
+        Args:
+            name: Metric name, e.g. "stage_latency_seconds"
+            value: The value to record
+            help_text: Description shown in the export
+            **labels: Label values, e.g. stage="scrape"
+        """
+        key = _labels(labels)
+        with self._lock:
+            if help_text:
+                self._help.setdefault(name, help_text)
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = RollingHistogram(self.window)
+            histogram.record(value)
+
+    def counter_value(self, name: str, **labels: str) -> float:
+        """Get the current value of a counter (0 if never increased)."""
+        with self._lock:
+            return self._counters.get(name, {}).get(_labels(labels), 0)
+
+    def quantiles(
+        self, name: str, **labels: str
+    ) -> Dict[str, Optional[float]]:
+        """
+        Get p50/p95/p99 of a histogram over the rolling window.
+
+        Returns:
+            dict: "p50", "p95" and "p99" (None when nothing was recorded)
+            plus the window "count"
+        """
+        with self._lock:
+            rolling = self._histograms.get(name, {}).get(_labels(labels))
+            window = rolling.window() if rolling else None
+        result: Dict[str, Optional[float]] = {
+            f"p{round(q * 100)}": window.quantile(q) if window else None
+            for q in QUANTILES
+        }
+        result["count"] = window.count if window else 0
+        return result
+
+    def render_prometheus(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics text
+        """
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted(self._counters):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(self._counters[name].items()):
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+            for name in sorted(self._histograms):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} summary")
+                for key, rolling in sorted(self._histograms[name].items()):
+                    window = rolling.window()
+                    for q in QUANTILES:
+                        value = window.quantile(q)
+                        if value is None:
+                            continue
+                        quantile = (("quantile", f"{q:g}"),)
+                        lines.append(
+                            f"{name}{_format_labels(key, quantile)} "
+                            f"{value:.6g}"
+                        )
+                    lines.append(
+                        f"{name}_sum{_format_labels(key)} "
+                        f"{rolling.total.sum:.6g}"
+                    )
+                    lines.append(
+                        f"{name}_count{_format_labels(key)} "
+                        f"{rolling.total.count}"
+                    )
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """
+        Write the Prometheus text to a file atomically, e.g. for the node
+        exporter's textfile collector.
+
+        Args:
+            path: The file to write
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """
+    Get the process-wide metrics registry.
+
+    Returns:
+        MetricsRegistry: The registry
+    """
+    return _registry
+
+
+def observe_spans(root: Span) -> None:
+    """
+    Record the duration of every finished span below a trace root.
+
+    Spans are labelled with their path from the root, e.g. "scrape/request",
+    so nested spans with the same name stay apart.
+
+    Args:
+        root: The root span, e.g. the "question" span of the pipeline
+    """
+    def visit(node: Span, path: str) -> None:
+        for child in list(node.children):
+            stage = f"{path}/{child.name}" if path else child.name
+            if child.end is not None:
+                _registry.observe(
+                    "stage_latency_seconds", child.duration,
+                    help_text="Latency of pipeline stages and their steps",
+                    stage=stage,
+                )
+            visit(child, stage)
+
+    visit(root, "")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serve the process-wide registry at /metrics."""
+
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = _registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass  # Scrapes every few seconds would flood the log
+
+
+_exporters_lock = threading.Lock()
+_exporters_started = False
+
+
+def start_exporters(
+    path: str = METRICS_FILE,
+    port: str = METRICS_PORT,
+    interval: float = METRICS_EXPORT_INTERVAL,
+) -> None:
+    """
+    Start the configured metrics exporters once per process.
+
+    Args:
+        path: File rewritten every interval seconds (empty disables it)
+        port: Port of the HTTP /metrics endpoint (empty disables it)
+        interval: Seconds between file exports
+    """
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+
+    if path:
+        def export_file() -> None:
+            while True:
+                try:
+                    _registry.write(path)
+                except OSError as e:
+                    print(f"Metrics export to {path} failed: {e}")
+                time.sleep(interval)
+
+        threading.Thread(
+            target=export_file, name="metrics-file", daemon=True
+        ).start()
+
+    if port:
+        try:
+            server = ThreadingHTTPServer(("", int(port)), _MetricsHandler)
+        except (OSError, ValueError) as e:
+            print(f"Metrics endpoint on port {port} unavailable: {e}")
+            return
+        threading.Thread(
+            target=server.serve_forever, name="metrics-http", daemon=True
+        ).start()
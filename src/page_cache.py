@@ -0,0 +1,249 @@
+"""
+Module providing a persistent, size-bounded cache of scraped page text.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import NamedTuple, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Location of the SQLite cache file (empty disables the cache), seconds an
+# entry is served without revalidation, and the maximum total size of the
+# compressed bodies before least recently used entries are evicted.
+PAGE_CACHE_PATH = os.getenv("PAGE_CACHE_PATH", ".cache/pages.sqlite3")
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "86400"))
+PAGE_CACHE_MAX_MB = float(os.getenv("PAGE_CACHE_MAX_MB", "200"))
+
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid")
+
+
+class CachedPage(NamedTuple):
+    """A cached page and the validators needed to revalidate it."""
+
+    text: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+    fresh: bool
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL so equivalent addresses share one cache entry.
+
+    Lowercases the scheme and host, drops default ports, fragments and
+    tracking parameters, and sorts the query string.
+
+    Args:
+        url: The URL to normalize
+
+    Returns:
+        str: The normalized URL
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    default_port = {"http": "80", "https": "443"}.get(scheme)
+    if default_port and netloc.endswith(f":{default_port}"):
+        netloc = netloc[: -len(default_port) - 1]
+    query = urlencode(
+        sorted(
+            (k, v)
+            for k, v in parse_qsl(parts.query, keep_blank_values=True)
+            if not k.lower().startswith(_TRACKING_PARAMS)
+        )
+    )
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
+
+
+class PageCache:
+    """
+    SQLite-backed store of extracted page text keyed by normalized URL.
+
+    Bodies are zlib-compressed. Entries older than the TTL are reported as
+    stale together with their ETag/Last-Modified validators so the caller can
+    revalidate them with a conditional request. When the total stored size
+    exceeds the limit, least recently accessed entries are evicted. The file
+    can be shared by several processes.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float = PAGE_CACHE_TTL,
+        max_bytes: int = int(PAGE_CACHE_MAX_MB * 1024 * 1024),
+    ):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=10
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL, "
+            "etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL, "
+            "accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed_at)"
+        )
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        """
+        Look up a page, marking it as recently used.
+
+        Args:
+            url: The page URL
+
+        Returns:
+            CachedPage or None if the page is not cached
+        """
+        key = normalize_url(url)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM pages "
+                "WHERE url = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE pages SET accessed_at = ? WHERE url = ?", (now, key)
+            )
+        body, etag, last_modified, fetched_at = row
+        return CachedPage(
+            text=zlib.decompress(body).decode("utf-8"),
+            etag=etag,
+            last_modified=last_modified,
+            fetched_at=fetched_at,
+            fresh=now - fetched_at < self.ttl,
+        )
+
+    def put(
+        self,
+        url: str,
+        text: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        """
+        Store extracted page text, evicting old entries if over the limit.
+
+        Args:
+            url: The page URL
+            text: The extracted text
+            etag: The response ETag header, if any
+            last_modified: The response Last-Modified header, if any
+        """
+        body = zlib.compress(text.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    normalize_url(url), body, len(body), etag, last_modified,
+                    now, now,
+                ),
+            )
+            self._evict()
+
+    def refresh(self, url: str) -> None:
+        """
+        Mark an entry as fresh again after a 304 Not Modified response.
+
+        Args:
+            url: The page URL
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET fetched_at = ?, accessed_at = ? "
+                "WHERE url = ?",
+                (now, now, normalize_url(url)),
+            )
+
+    def purge_expired(self) -> int:
+        """
+        Delete entries older than the TTL.
+
+        Returns:
+            int: Number of entries deleted
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM pages WHERE fetched_at < ?",
+                (time.time() - self.ttl,),
+            )
+        return cursor.rowcount
+
+    def clear(self) -> None:
+        """Delete every entry."""
+        with self._lock:
+            self._conn.execute("DELETE FROM pages")
+
+    def total_bytes(self) -> int:
+        """
+        Get the total size of the stored compressed bodies.
+
+        Returns:
+            int: Size in bytes
+        """
+        with self._lock:
+            return self._total_bytes()
+
+    def _total_bytes(self) -> int:
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages")
+        return int(row.fetchone()[0])
+
+    def _evict(self) -> None:
+        excess = self._total_bytes() - self.max_bytes
+        if excess <= 0:
+            return
+        rows = self._conn.execute(
+            "SELECT url, size FROM pages ORDER BY accessed_at ASC"
+        ).fetchall()
+        victims = []
+        for url, size in rows:
+            if excess <= 0:
+                break
+            victims.append((url,))
+            excess -= size
+        self._conn.executemany("DELETE FROM pages WHERE url = ?", victims)
+
+
+_page_cache: Optional[PageCache] = None
+_page_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> Optional[PageCache]:
+    """
+    Get the process-wide page cache.
+
+    Returns:
+        PageCache or None if PAGE_CACHE_PATH is empty or the cache cannot be
+        opened
+    """
+    global _page_cache
+    if _page_cache is None and PAGE_CACHE_PATH:
+        with _page_cache_lock:
+            if _page_cache is None:
+                try:
+                    _page_cache = PageCache(PAGE_CACHE_PATH)
+                except (OSError, sqlite3.Error) as e:
+                    print(f"Page cache unavailable: {e}")
+                    return None
+    return _page_cache
@@ -0,0 +1,481 @@
+"""
+Module to answer a question end to end with overlapping pipeline stages.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from .answer_cache import AnswerCache, get_answer_cache
+from .concurrency import context_executor
+from .llm import generate_answer, split_sources, stream_answer
+from .llm_clients import track_setup_times
+from .metrics import get_registry, observe_spans
+from .quality_check import validate_citations
+from .retry import RetryBudget
+from .scrape import SCRAPE_DEADLINE, RetryLater, ScrapeSkipped, scrape_page
+from .search import SEARCH_REGION, search_web
+from .telemetry import record_telemetry
+from .tracing import TRACE_DIR, export_trace, span, traced_call
+
+load_dotenv()
+
+# Number of search results scraped at once (over-fetching makes slow or empty
+# hosts cheap to skip), and how many usable pages are kept as sources;
+# answer generation starts as soon as that many are ready.
+PIPELINE_MAX_SOURCES = int(os.getenv("PIPELINE_MAX_SOURCES", "10"))
+PIPELINE_MIN_SOURCES = int(os.getenv("PIPELINE_MIN_SOURCES", "3"))
+
+# Result fields stored in the answer cache
+_CACHED_FIELDS = (
+    "search_results", "sources", "scraped_texts", "answer", "sources_md",
+    "quality_results",
+)
+
+ProgressCallback = Callable[[int, str], None]
+AnswerCallback = Callable[[str], None]
+
+
+class QuestionPipeline:
+    """
+    Asynchronous search, scrape, answer, validate and telemetry pipeline.
+
+    Every search hit is scraped as soon as it is available, and answer
+    generation starts once the fastest min_sources pages have usable content
+    instead of waiting for the slowest page; the other scrapes are
+    cancelled. Blocking work runs on a thread
+    pool, so one pipeline object can serve the Streamlit app, a batch job or
+    an API server.
+    """
+
+    def __init__(
+        self,
+        max_sources: int = PIPELINE_MAX_SOURCES,
+        min_sources: int = PIPELINE_MIN_SOURCES,
+        scrape_deadline: float = SCRAPE_DEADLINE,
+        region: str = SEARCH_REGION,
+        validate: bool = True,
+        use_cache: bool = True,
+        on_progress: Optional[ProgressCallback] = None,
+        on_answer_chunk: Optional[AnswerCallback] = None,
+    ):
+        """
+        Args:
+            max_sources: Number of search results to fetch and scrape
+            min_sources: Usable pages kept as sources; generation starts
+                once this many are ready
+            scrape_deadline: Seconds to wait for pages before generating
+                with whatever is ready
+            region: Country code of the search results, e.g. "ke" or "us"
+            validate: Whether to run the citation quality check in the
+                background once the answer is ready
+            use_cache: Whether to serve and store answers in the answer
+                cache
+            on_progress: Called with (percent, message) as stages finish
+            on_answer_chunk: If set, the answer is streamed and this is
+                called with the partial answer text after every chunk
+        """
+        self.max_sources = max_sources
+        self.min_sources = max(1, min(min_sources, max_sources))
+        self.scrape_deadline = scrape_deadline
+        self.region = region
+        self.validate = validate
+        self.use_cache = use_cache
+        self.on_progress = on_progress
+        self.on_answer_chunk = on_answer_chunk
+
+    @property
+    def cache_scope(self) -> str:
+        """
+        Scope of this pipeline's answers in the answer cache.
+
+        Answers are only reused by pipelines that search the same region and
+        fetch and keep the same number of sources.
+        """
+        return f"{self.region}/{self.max_sources}/{self.min_sources}"
+
+    def _progress(self, percent: int, message: str) -> None:
+        if self.on_progress is not None:
+            self.on_progress(percent, message)
+
+    @staticmethod
+    async def _scrape_source(
+        loop: asyncio.AbstractEventLoop,
+        executor: Any,
+        scrape: Callable[[str], str],
+        url: str,
+        budget: RetryBudget,
+    ) -> str:
+        """
+        Scrape one page, scheduling its retries on the event loop.
+
+        A page that failed transiently waits on an asyncio timer rather than
+        on a worker thread, so the other pages and stages keep going.
+
+        Returns:
+            str: The extracted text, or "" once the retries are spent
+        """
+        attempt = 0
+        while True:
+            try:
+                return await loop.run_in_executor(
+                    executor,
+                    traced_call(
+                        "scrape", scrape, url, url=url, attempt=attempt + 1
+                    ),
+                )
+            except RetryLater as e:
+                delay = budget.next_delay(attempt, e.retry_after)
+                if delay is None:
+                    return ""
+                print(f"Retrying {url} in {delay:.1f} seconds...")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def _gather_sources(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        executor: Any,
+        search_results: List[Dict[str, str]],
+    ) -> Dict[str, str]:
+        """
+        Scrape all hits and return once enough of them have content.
+
+        Returns:
+            dict: URL to text for the first min_sources pages that finished
+            with content
+        """
+        cancel = threading.Event()
+        scrape = partial(scrape_page, _cancel=cancel, _defer_retries=True)
+        budget = RetryBudget()
+        pending = {}
+        for source in search_results:
+            url = source["url"]
+            future = loop.create_task(
+                self._scrape_source(loop, executor, scrape, url, budget)
+            )
+            pending[future] = url
+        scraped: Dict[str, str] = {}
+        deadline = loop.time() + self.scrape_deadline
+        while pending and len(scraped) < self.min_sources:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                print(
+                    f"Scrape deadline reached with {len(scraped)} usable "
+                    f"source(s)"
+                )
+                break
+            done, _ = await asyncio.wait(
+                pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in done:
+                url = pending.pop(future)
+                try:
+                    text = future.result()
+                except ScrapeSkipped as e:
+                    print(f"Skipped {url}: {str(e)}")
+                    self._count_scrape("skipped")
+                    continue
+                except Exception as e:
+                    print(f"Unexpected error scraping {url}: {str(e)}")
+                    self._count_scrape("error")
+                    continue
+                if text and len(scraped) >= self.min_sources:
+                    self._count_scrape("surplus")
+                    continue
+                self._count_scrape("ok" if text else "empty")
+                if text:
+                    scraped[url] = text
+
+        # Pages still in flight or waiting to retry are no longer needed for
+        # this answer; their scrapes stop at the next chunk or retry
+        cancel.set()
+        for future in pending:
+            future.cancel()
+            self._count_scrape("abandoned")
+        return scraped
+
+    @staticmethod
+    def _count_scrape(result: str) -> None:
+        get_registry().inc(
+            "scrape_pages_total",
+            help_text="Scraped pages by outcome: ok, empty, error, skipped, "
+            "surplus, abandoned",
+            result=result,
+        )
+
+    async def _stream_answer(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        executor: Any,
+        question: str,
+        sources: List[Dict[str, str]],
+        scraped_texts: Dict[str, str],
+        on_first_chunk: Callable[[], None],
+    ) -> Tuple[str, Optional[str]]:
+        """
+        Stream the answer from a worker thread into on_answer_chunk.
+
+        Returns:
+            Tuple of (answer text with citations, markdown-formatted sources
+            or None)
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def produce() -> None:
+            try:
+                with span("generate", stream=True):
+                    for chunk in stream_answer(
+                        question, sources, scraped_texts
+                    ):
+                        loop.call_soon_threadsafe(queue.put_nowait, chunk)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+
+        producer = loop.run_in_executor(executor, produce)
+        parts: List[str] = []
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                break
+            if not parts:
+                on_first_chunk()
+            parts.append(chunk)
+            if self.on_answer_chunk is not None:
+                partial = "".join(parts).split("Sources:", 1)[0]
+                self.on_answer_chunk(partial.strip())
+        await producer  # Re-raise any generation error
+        return split_sources("".join(parts), sources)
+
+    async def run(self, question: str) -> Dict[str, Any]:
+        """
+        Answer a question.
+
+        Every stage is timed in a span under one "question" span, which is
+        written to TRACE_DIR when that is set. Answers to the same or a
+        near-duplicate question are served from the answer cache without
+        searching, scraping or calling the LLM.
+
+        Args:
+            question: The user's question
+
+        Returns:
+            dict: The search results, the sources used, their scraped text,
+            the answer and sources markdown, a Future resolving to the
+            quality check results (None when validation is off), a Future
+            resolving to the telemetry, the time to the first answer token,
+            the end-to-end latency in seconds, the trace (root Span) and,
+            for cached answers, "cached" with the question the answer was
+            stored under, the similarity and the age in seconds. If the
+            search finds nothing, only the question, the empty search results
+            and the trace are filled in.
+        """
+        cache = get_answer_cache() if self.use_cache else None
+        with span("question", question=question) as trace:
+            result = await self._answer(question, cache)
+        result["trace"] = trace
+
+        cached = result["cached"]
+        cache_question = cached["question"] if cached else question
+        if cache is not None and not cached and result["answer"] is not None:
+            cache.put(
+                question,
+                {key: result[key] for key in _CACHED_FIELDS if key in result},
+                scope=self.cache_scope,
+            )
+        stored_quality = result["quality_results"]
+        result["quality_results"] = None
+        if self.validate and result["answer"] is not None:
+            if stored_quality is not None:
+                result["quality_results"] = Future()
+                result["quality_results"].set_result(stored_quality)
+            else:
+                result["quality_results"] = self._start_validation(
+                    result["answer"], result["sources"],
+                    result["scraped_texts"], cache, cache_question,
+                    self.cache_scope,
+                )
+        observe_spans(trace)
+        if TRACE_DIR:
+            path = os.path.join(
+                TRACE_DIR, f"trace-{int(trace.started_at * 1000)}.json"
+            )
+            try:
+                export_trace(trace, path)
+            except OSError as e:
+                print(f"Could not write trace to {path}: {e}")
+        return result
+
+    async def _answer(
+        self, question: str, cache: Optional[AnswerCache]
+    ) -> Dict[str, Any]:
+        start_time = time.time()
+        setup_times = track_setup_times()
+        result: Dict[str, Any] = {
+            "question": question,
+            "search_results": [],
+            "sources": [],
+            "scraped_texts": {},
+            "answer": None,
+            "sources_md": None,
+            "quality_results": None,
+            "telemetry": None,
+            "time_to_first_token": None,
+            "latency": 0.0,
+            "trace": None,
+            "cached": None,
+        }
+
+        def mark_first_token() -> None:
+            result["time_to_first_token"] = time.time() - start_time
+
+        if cache is not None:
+            with span("answer_cache") as lookup:
+                cached = cache.get(question, self.cache_scope)
+                lookup.set(hit=cached is not None)
+            get_registry().inc(
+                "answer_cache_lookups_total",
+                help_text="Answer cache lookups by result: exact, near, miss",
+                result=(
+                    "miss" if cached is None
+                    else "exact" if cached.similarity == 1.0 else "near"
+                ),
+            )
+            if cached is not None:
+                result.update(cached.result)
+                result["cached"] = {
+                    "question": cached.question,
+                    "similarity": cached.similarity,
+                    "age": start_time - cached.stored_at,
+                }
+                mark_first_token()
+                result["latency"] = time.time() - start_time
+                result["telemetry"] = record_telemetry(
+                    question, result["sources"], result["scraped_texts"],
+                    result["answer"], latency=result["latency"],
+                    time_to_first_token=result["time_to_first_token"],
+                )
+                self._progress(100, "Done!")
+                return result
+
+        loop = asyncio.get_running_loop()
+        executor = context_executor(self.max_sources + 2, "pipeline")
+        try:
+            self._progress(10, "Searching the web...")
+            search_results = await loop.run_in_executor(
+                executor,
+                traced_call(
+                    "search", search_web, question, self.max_sources,
+                    self.region,
+                ),
+            )
+            result["search_results"] = search_results
+            if not search_results:
+                return result
+
+            self._progress(30, "Scraping content from sources...")
+            scraped_texts = await self._gather_sources(
+                loop, executor, search_results
+            )
+            # Keep search rank order so citation numbers follow relevance
+            sources = [s for s in search_results if s["url"] in scraped_texts]
+            result["sources"] = sources
+            result["scraped_texts"] = scraped_texts
+            if not sources:
+                raise ValueError(
+                    "No valid content could be scraped from any sources."
+                )
+
+            self._progress(50, "Analyzing sources and generating answer...")
+            if self.on_answer_chunk is not None:
+                answer, sources_md = await self._stream_answer(
+                    loop, executor, question, sources, scraped_texts,
+                    mark_first_token,
+                )
+            else:
+                answer, sources_md = await loop.run_in_executor(
+                    executor,
+                    traced_call(
+                        "generate", generate_answer, question, sources,
+                        scraped_texts,
+                    ),
+                )
+                mark_first_token()  # The whole answer arrives at once
+            result["answer"] = answer
+            result["sources_md"] = sources_md
+
+            result["latency"] = time.time() - start_time
+            # Token counting happens in the background, off the request path
+            result["telemetry"] = record_telemetry(
+                question, sources, scraped_texts, answer,
+                latency=result["latency"],
+                time_to_first_token=result["time_to_first_token"],
+                # Zero once the model handles are warm
+                client_setup_time=sum(setup_times.values()),
+            )
+            self._progress(100, "Done!")
+            return result
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _start_validation(
+        answer: str,
+        sources: List[Dict[str, str]],
+        scraped_texts: Dict[str, str],
+        cache: Optional[AnswerCache] = None,
+        cache_question: str = "",
+        cache_scope: str = "",
+    ) -> Future:
+        """
+        Validate the citations of an answer on a background thread.
+
+        The job has its own trace, whose stage latencies are recorded when
+        it finishes, so the answer can be shown without waiting for it. The
+        results are added to the cached answer of cache_question in
+        cache_scope, if any. The model setup paid by the job is recorded on
+        its "validation" span.
+
+        Returns:
+            Future: Resolves to the quality check results
+        """
+        def job() -> Dict[str, Any]:
+            setup_times = track_setup_times()
+            with span("validation") as root:
+                with span("validate"):
+                    quality_results = validate_citations(
+                        answer, sources, scraped_texts
+                    )
+                # Zero once the validation model handle is warm
+                root.set(client_setup_time=sum(setup_times.values()))
+            observe_spans(root)
+            if cache is not None and "validation_error" not in quality_results:
+                cache.update(
+                    cache_question, cache_scope,
+                    quality_results=quality_results,
+                )
+            return quality_results
+
+        executor = context_executor(1, "validate")
+        try:
+            return executor.submit(job)
+        finally:
+            executor.shutdown(wait=False)
+
+    def run_sync(self, question: str) -> Dict[str, Any]:
+        """
+        Answer a question from synchronous code.
+
+        Args:
+            question: The user's question
+
+        Returns:
+            dict: See run()
+        """
+        return asyncio.run(self.run(question))
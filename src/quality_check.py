@@ -4,12 +4,57 @@ import os
 import re
 from typing import List, Tuple, Dict, Any
 
-import google.generativeai as genai
 from dotenv import load_dotenv
-import streamlit as st
+from .citation_score import score_citations
+from .concurrency import context_executor
+from .llm_clients import get_model
+from .local_verify import VALIDATION_PREFILTER, LocalVerifier
+from .metrics import get_registry
+from .ranking import VALIDATION_TOKEN_BUDGET, PassageIndex
+from .telemetry import count_tokens_batch
+from .tracing import span, traced_call
 
 load_dotenv()
 
+# Tokens of sentences and source excerpts sent to the validator model per
+# request, and how many of those requests run at once for long answers.
+VALIDATION_SHARD_TOKENS = int(os.getenv("VALIDATION_SHARD_TOKENS", "4000"))
+VALIDATION_WORKERS = int(os.getenv("VALIDATION_WORKERS", "4"))
+
+# One validator verdict line, e.g. "Sentence 2, Citation [3]: YES - reason".
+# Leading bullets or numbering, markdown emphasis, missing brackets, extra
+# whitespace and lowercase verdicts are tolerated.
+VERDICT_LINE = re.compile(
+    r"^[\s\-*•>#]*(?:\d+[.)]\s+)?[*_]*"
+    r"sentence\s*(\d+)\s*[,;]?\s*citation\s*\[?\s*(\d+)\s*\]?"
+    r"[\s:*_\-–—]*(yes|no)\b[\s*_]*[-–—:]?\s*(.*)$",
+    re.IGNORECASE,
+)
+
+
+def parse_validation_response(
+    validation_text: str,
+) -> Dict[Tuple[int, int], Tuple[bool, str]]:
+    """
+    Parse the validator output into verdicts in a single pass.
+
+    Args:
+        validation_text: The validator model's response
+
+    Returns:
+        Dictionary mapping (sentence number, citation number) to
+        (supported, explanation); the first verdict for a pair wins
+    """
+    verdicts: Dict[Tuple[int, int], Tuple[bool, str]] = {}
+    for line in validation_text.splitlines():
+        match = VERDICT_LINE.match(line.strip())
+        if match:
+            key = (int(match.group(1)), int(match.group(2)))
+            verdicts.setdefault(
+                key, (match.group(3).upper() == "YES", match.group(4).strip())
+            )
+    return verdicts
+
 
 def extract_citations(answer_text: str) -> List[Tuple[str, List[int]]]:
     """
@@ -42,63 +87,118 @@ def extract_citations(answer_text: str) -> List[Tuple[str, List[int]]]:
     return results
 
 
-@st.cache_data
-def validate_citations(
-    answer: str,
-    sources_data: List[Dict[str, str]],
-    scraped_texts: Dict[str, str]
-) -> Dict[str, Any]:
+Pending = Tuple[int, str, List[int]]
+
+
+def shard_citations(
+    pending: List[Pending],
+    sentence_tokens: List[int],
+    source_tokens: Dict[int, int],
+    token_budget: int = VALIDATION_SHARD_TOKENS,
+    source_budget: int = VALIDATION_TOKEN_BUDGET,
+) -> List[List[Pending]]:
     """
-    Validate that citations in the answer are supported by the source texts.
+    Split the sentences to validate into shards that fit a token budget.
+
+    Every source appears once per shard, so a sentence costs its own tokens
+    plus up to source_budget more tokens of each cited source, but never
+    more than the source has left. Sentences stay in answer order and a
+    sentence that alone exceeds the budget gets a shard of its own.
 
     Args:
-        answer: The answer text with citations
-        sources_data: List of source dictionaries with 'title' and 'url'
-        scraped_texts: Dictionary mapping source URLs to their scraped text
+        pending: Tuples of (sentence index, sentence, citation numbers)
+        sentence_tokens: Token count of each pending sentence
+        source_tokens: Citation number to token count of the source text
+        token_budget: Maximum tokens of sentences and sources per shard
+        source_budget: Tokens of a source shown per sentence citing it
 
     Returns:
-        Dictionary with overall score and per-citation validation
+        List of shards, each a list of pending tuples
     """
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY not set.")
-
-    genai.configure(api_key=api_key)
+    shards: List[List[Pending]] = []
+    shard: List[Pending] = []
+    shown: Dict[int, int] = {}
+    used = 0
 
-    try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-    except Exception as e:
-        print(f"Model initialization error for validator: {e}")
+    def source_cost(citation_nums: List[int]) -> Dict[int, int]:
         return {
-            "overall_score": "N/A", "validation_error": str(e), "citations": []
+            num: max(
+                0,
+                min(
+                    source_budget,
+                    source_tokens.get(num, 0) - shown.get(num, 0),
+                ),
+            )
+            for num in set(citation_nums)
         }
 
-    citations_data = extract_citations(answer)
-    results: Dict[str, Any] = {"overall_score": "Pending", "citations": []}
+    for item, tokens in zip(pending, sentence_tokens):
+        extra = source_cost(item[2])
+        if shard and used + tokens + sum(extra.values()) > token_budget:
+            shards.append(shard)
+            shard, shown, used = [], {}, 0
+            extra = source_cost(item[2])
+        shard.append(item)
+        used += tokens + sum(extra.values())
+        for num, value in extra.items():
+            shown[num] = shown.get(num, 0) + value
+    if shard:
+        shards.append(shard)
+    return shards
+
+
+def _validation_prompt(
+    shard: List[Pending],
+    sources_data: List[Dict[str, str]],
+    index: PassageIndex,
+) -> str:
+    """
+    Build the validator prompt for one shard.
 
-    validation_prompt_parts: List[str] = [
-        "Task: Verify if the cited information is supported by the sources.\n"
-    ]
+    Each cited source is shown once, above the sentences, with the passages
+    that best match the sentences citing it.
 
-    for idx, (sentence, citation_nums) in enumerate(citations_data):
-        validation_prompt_parts.append(f"\nSentence {idx + 1}: {sentence}\n")
+    Args:
+        shard: Tuples of (sentence index, sentence, citation numbers)
+        sources_data: List of source dictionaries with 'title' and 'url'
+        index: Passage index over the source texts
 
-        for citation_num in citation_nums:
-            source_idx = citation_num - 1
-            if source_idx < 0 or source_idx >= len(sources_data):
-                continue
+    Returns:
+        str: The prompt
+    """
+    citing: Dict[int, List[str]] = {}
+    for _, sentence, citation_nums in shard:
+        for citation_num in dict.fromkeys(citation_nums):
+            citing.setdefault(citation_num, []).append(sentence)
 
-            source_url = sources_data[source_idx]["url"]
-            source_text = scraped_texts.get(source_url, "")
-            validation_prompt_parts.append(
-                f"Source [{citation_num}] content: {source_text[:2000]}\n"
-            )
+    validation_prompt_parts: List[str] = [
+        "Task: Verify if the cited information is supported by the sources.\n",
+        "\nSources:\n",
+    ]
+    for citation_num in sorted(citing):
+        source_url = sources_data[citation_num - 1]["url"]
+        sentences = citing[citation_num]
+        source_text = index.select(
+            " ".join(sentences),
+            VALIDATION_TOKEN_BUDGET * len(sentences),
+            keys=[source_url],
+        ).get(source_url, "")
+        validation_prompt_parts.append(
+            f"Source [{citation_num}] content: {source_text}\n"
+        )
+
+    validation_prompt_parts.append("\nSentences:\n")
+    for idx, sentence, citation_nums in shard:
+        cited = ", ".join(f"[{num}]" for num in dict.fromkeys(citation_nums))
+        validation_prompt_parts.append(
+            f"Sentence {idx + 1} (cites {cited}): {sentence}\n"
+        )
 
     validation_prompt_parts.append(
         """
     Instructions:
     1. For each sentence, analyze if the factual claims are directly supported
-        by the cited sources.
+        by the sources it cites. Ignore sources it does not cite.
     2. For each citation, answer YES or NO, followed by a brief explanation.
     3. Say YES only if the source directly supports ALL claims in the sentence.
     4. Say NO if any claim is unsupported, exaggerated, or contradicted.
@@ -108,12 +208,148 @@ def validate_citations(
         Sentence 2, Citation [p]: YES/NO - Explanation
     """
     )
-    validation_prompt = "".join(validation_prompt_parts)
+    return "".join(validation_prompt_parts)
 
-    try:
-        response = model.generate_content(validation_prompt)
+
+def _validate_shard(
+    model: Any, prompt: str
+) -> Dict[Tuple[int, int], Tuple[bool, str]]:
+    with span("llm", prompt_chars=len(prompt)):
+        response = model.generate_content(prompt)
         validation_text = response.text
-        validation_lines = validation_text.split("\n")
+    return parse_validation_response(validation_text)
+
+
+def _validate_with_llm(
+    model: Any,
+    pending: List[Pending],
+    sources_data: List[Dict[str, str]],
+    texts: Dict[str, str],
+) -> Dict[Tuple[int, int], Tuple[bool, str]]:
+    """
+    Ask the validation model about the citations that need judgement.
+
+    The sentences are split into shards within VALIDATION_SHARD_TOKENS and
+    the shards are validated concurrently, so long answers take about as
+    long as short ones.
+
+    Args:
+        model: The validation model
+        pending: Tuples of (sentence index, sentence, citation numbers)
+        sources_data: List of source dictionaries with 'title' and 'url'
+        texts: Dictionary mapping source URLs to their scraped text
+
+    Returns:
+        Dictionary mapping (sentence number, citation number) to
+        (supported, explanation)
+    """
+    cited = sorted({num for _, _, nums in pending for num in nums})
+    counts = count_tokens_batch(
+        [sentence for _, sentence, _ in pending]
+        + [texts.get(sources_data[num - 1]["url"], "") for num in cited]
+    )
+    shards = shard_citations(
+        pending,
+        counts[: len(pending)],
+        dict(zip(cited, counts[len(pending):])),
+        VALIDATION_SHARD_TOKENS,
+    )
+
+    index = PassageIndex(texts)
+    prompts = [
+        _validation_prompt(shard, sources_data, index) for shard in shards
+    ]
+    if len(prompts) == 1:
+        return _validate_shard(model, prompts[0])
+
+    verdicts: Dict[Tuple[int, int], Tuple[bool, str]] = {}
+    executor = context_executor(
+        min(VALIDATION_WORKERS, len(prompts)), "validate"
+    )
+    try:
+        futures = [
+            executor.submit(
+                traced_call(
+                    "shard", _validate_shard, model, prompt,
+                    shard=number, sentences=len(shard),
+                )
+            )
+            for number, (shard, prompt) in enumerate(zip(shards, prompts))
+        ]
+        for future in futures:
+            verdicts.update(future.result())
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return verdicts
+
+
+def validate_citations(
+    answer: str,
+    sources_data: List[Dict[str, str]],
+    scraped_texts: Dict[str, str]
+) -> Dict[str, Any]:
+    """
+    Validate that citations in the answer are supported by the source texts.
+
+    Args:
+        answer: The answer text with citations
+        sources_data: List of source dictionaries with 'title' and 'url'
+        scraped_texts: Dictionary mapping source URLs to their scraped text
+
+    Returns:
+        Dictionary with per-sentence validation and the scores of
+        score_citations: overall_score for sentences and citation_score for
+        unique citations
+    """
+    citations_data = extract_citations(answer)
+    results: Dict[str, Any] = {"overall_score": "Pending", "citations": []}
+    texts = {s["url"]: scraped_texts.get(s["url"], "") for s in sources_data}
+
+    # Decide clear-cut citations locally; only the rest go to the LLM
+    verdicts: Dict[Tuple[int, int], Tuple[bool, str]] = {}
+    pending: List[Tuple[int, str, List[int]]] = []
+    verifier = LocalVerifier(texts)
+    for idx, (sentence, citation_nums) in enumerate(citations_data):
+        unresolved = []
+        for citation_num in citation_nums:
+            source_idx = citation_num - 1
+            if source_idx < 0 or source_idx >= len(sources_data):
+                continue
+            local = None
+            if VALIDATION_PREFILTER:
+                local = verifier.verify(
+                    sentence, sources_data[source_idx]["url"]
+                )
+            if local is None:
+                unresolved.append(citation_num)
+            else:
+                verdicts[(idx + 1, citation_num)] = local
+            get_registry().inc(
+                "citation_checks_total",
+                help_text="Citation checks by where they were decided",
+                decided_by="llm" if local is None else "local",
+            )
+        if unresolved:
+            pending.append((idx, sentence, unresolved))
+
+    if pending:
+        try:
+            model = get_model("validation")
+        except ValueError:
+            raise
+        except Exception as e:
+            print(f"Model initialization error for validator: {e}")
+            return {
+                "overall_score": "N/A",
+                "validation_error": str(e),
+                "citations": [],
+            }
+
+    try:
+        if pending:
+            verdicts.update(
+                _validate_with_llm(model, pending, sources_data, texts)
+            )
 
         for idx, (sentence, citation_nums) in enumerate(citations_data):
             sentence_validations = []
@@ -130,25 +366,8 @@ def validate_citations(
                     )
                     continue
 
-                pattern = (
-                    rf"Sentence {idx + 1}, Citation \[{citation_num}\]: "
-                    r"(YES|NO) - (.*)"
-                )
-
-                for line in validation_lines:
-                    match = re.match(pattern, line.strip())
-                    if match:
-                        verdict = match.group(1).upper()
-                        explanation = match.group(2)
-                        sentence_validations.append(
-                            {
-                                "citation_num": citation_num,
-                                "valid": verdict == "YES",
-                                "reason": explanation,
-                            }
-                        )
-                        break
-                else:
+                verdict = verdicts.get((idx + 1, citation_num))
+                if verdict is None:
                     sentence_validations.append(
                         {
                             "citation_num": citation_num,
@@ -156,6 +375,14 @@ def validate_citations(
                             "reason": "Validation not found",
                         }
                     )
+                else:
+                    sentence_validations.append(
+                        {
+                            "citation_num": citation_num,
+                            "valid": verdict[0],
+                            "reason": verdict[1],
+                        }
+                    )
 
             sentence_valid = any(v["valid"] for v in sentence_validations)
             results["citations"].append(
@@ -167,30 +394,7 @@ def validate_citations(
                 }
             )
 
-        valid_sentences = sum(
-            c["validation"] == "Valid" for c in results["citations"]
-        )
-        total_sentences = len(results["citations"])
-
-        if total_sentences > 0:
-            score_pct = (valid_sentences / total_sentences) * 100
-
-            if score_pct >= 90:
-                rating = "Excellent"
-            elif score_pct >= 75:
-                rating = "Good"
-            elif score_pct >= 50:
-                rating = "Fair"
-            else:
-                rating = "Poor"
-
-            results["overall_score"] = (
-                f"{rating} ({valid_sentences}/{total_sentences} valid "
-                f"citations, {score_pct:.1f}%)"
-            )
-        else:
-            results["overall_score"] = "N/A (No citations found)"
-
+        results.update(score_citations(results["citations"]))
         return results
 
     except Exception as e:
@@ -0,0 +1,228 @@
+"""
+Module to rank passages of scraped text by relevance with BM25.
+"""
+
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from .telemetry import count_tokens_batch
+
+load_dotenv()
+
+# Words per passage, tokens of source text allowed in the answer prompt, and
+# tokens of each cited source shown to the validator per sentence.
+PASSAGE_WORDS = int(os.getenv("PASSAGE_WORDS", "120"))
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+VALIDATION_TOKEN_BUDGET = int(os.getenv("VALIDATION_TOKEN_BUDGET", "500"))
+
+PASSAGE_SEPARATOR = " ... "
+
+_WORD = re.compile(r"\w+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+STOPWORDS = frozenset(
+    "a an and are as at be been but by can do does for from had has have how "
+    "in into is it its of on or that the their there these this to was were "
+    "what when where which who why will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase terms for ranking, leaving out stopwords.
+
+    Args:
+        text: The text to tokenize
+
+    Returns:
+        list: The terms in order
+    """
+    return [
+        word for word in _WORD.findall(text.lower()) if word not in STOPWORDS
+    ]
+
+
+def split_passages(text: str, max_words: int = PASSAGE_WORDS) -> List[str]:
+    """
+    Split text into passages of whole sentences of up to max_words words.
+
+    Sentences longer than max_words are split between words.
+
+    Args:
+        text: The text to split
+        max_words: Maximum number of words per passage
+
+    Returns:
+        list: The passages in document order
+    """
+    passages: List[str] = []
+    current: List[str] = []
+    for sentence in _SENTENCE_END.split(text.strip()):
+        words = sentence.split()
+        while len(words) > max_words:
+            if current:
+                passages.append(" ".join(current))
+                current = []
+            passages.append(" ".join(words[:max_words]))
+            words = words[max_words:]
+        if current and len(current) + len(words) > max_words:
+            passages.append(" ".join(current))
+            current = []
+        current.extend(words)
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+class PassageIndex:
+    """
+    BM25 index over the passages of one or more documents.
+
+    The index is built once per request with an inverted list per term, so
+    scoring a query only touches the passages that contain its terms.
+    """
+
+    def __init__(
+        self,
+        texts: Dict[str, str],
+        max_words: int = PASSAGE_WORDS,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        """
+        Args:
+            texts: Document key (e.g. a source URL) to document text
+            max_words: Maximum number of words per passage
+            k1: BM25 term frequency saturation
+            b: BM25 length normalization
+        """
+        self.texts = texts
+        self.k1 = k1
+        self.b = b
+        # Each passage is (document key, position in the document, text)
+        self.passages: List[Tuple[str, int, str]] = []
+        self._lengths: List[int] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._tokens: List[Optional[int]] = []
+
+        for key, text in texts.items():
+            if not text:
+                continue
+            passages = split_passages(text, max_words)
+            for position, passage in enumerate(passages):
+                idx = len(self.passages)
+                terms = tokenize(passage)
+                self.passages.append((key, position, passage))
+                self._lengths.append(len(terms))
+                self._tokens.append(None)
+                for term, freq in Counter(terms).items():
+                    self._postings.setdefault(term, []).append((idx, freq))
+
+        count = len(self.passages)
+        self._avg_length = sum(self._lengths) / count if count else 0.0
+
+    def scores(self, query: str) -> List[float]:
+        """
+        Score every passage against a query.
+
+        Args:
+            query: The query text
+
+        Returns:
+            list: The BM25 score of each passage, in passage order
+        """
+        scores = [0.0] * len(self.passages)
+        count = len(self.passages)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(
+                1 + (count - len(postings) + 0.5) / (len(postings) + 0.5)
+            )
+            for idx, freq in postings:
+                norm = 1 - self.b + self.b * (
+                    self._lengths[idx] / (self._avg_length or 1)
+                )
+                scores[idx] += idf * freq * (self.k1 + 1) / (
+                    freq + self.k1 * norm
+                )
+        return scores
+
+    def _passage_tokens(self, indices: List[int]) -> Dict[int, int]:
+        uncounted = [idx for idx in indices if self._tokens[idx] is None]
+        if uncounted:
+            counts = count_tokens_batch(
+                [self.passages[idx][2] for idx in uncounted]
+            )
+            for idx, tokens in zip(uncounted, counts):
+                self._tokens[idx] = tokens
+        return {idx: int(self._tokens[idx] or 0) for idx in indices}
+
+    def select(
+        self,
+        query: str,
+        token_budget: int,
+        keys: Optional[List[str]] = None,
+    ) -> Dict[str, str]:
+        """
+        Keep the passages most relevant to a query within a token budget.
+
+        The best passage of every document is always kept so that no source
+        disappears; the remaining budget goes to the highest scoring
+        passages overall that share a term with the query. Kept passages are
+        returned in document order, joined with PASSAGE_SEPARATOR. Documents
+        that already fit are returned unchanged.
+
+        Args:
+            query: The query text
+            token_budget: Maximum number of tokens across the kept passages
+            keys: Documents to select from, defaults to all of them
+
+        Returns:
+            dict: Document key to the text of its kept passages
+        """
+        wanted = set(self.texts if keys is None else keys)
+        candidates = [
+            idx for idx, passage in enumerate(self.passages)
+            if passage[0] in wanted
+        ]
+        tokens = self._passage_tokens(candidates)
+        if sum(tokens.values()) <= token_budget:
+            return {
+                key: self.texts[key] for key in self.texts
+                if key in wanted and self.texts[key]
+            }
+
+        scores = self.scores(query)
+        ranked = sorted(candidates, key=lambda idx: (-scores[idx], idx))
+        kept = set()
+        used = 0
+        seen_keys = set()
+        for idx in ranked:
+            key = self.passages[idx][0]
+            if key not in seen_keys:
+                seen_keys.add(key)
+                kept.add(idx)
+                used += tokens[idx]
+        for idx in ranked:
+            if scores[idx] <= 0:
+                break  # Passages sharing no terms with the query add nothing
+            if idx in kept:
+                continue
+            if used + tokens[idx] <= token_budget:
+                kept.add(idx)
+                used += tokens[idx]
+
+        selected: Dict[str, List[str]] = {}
+        for idx in sorted(kept):
+            key, _, passage = self.passages[idx]
+            selected.setdefault(key, []).append(passage)
+        return {
+            key: PASSAGE_SEPARATOR.join(selected[key])
+            for key in self.texts if key in selected
+        }
@@ -0,0 +1,96 @@
+"""
+Module with the retry policy of the scrape scheduler.
+"""
+
+import os
+import random
+import threading
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from .metrics import get_registry
+
+load_dotenv()
+
+# Retries allowed across all pages of one question, and the share of each
+# backoff delay that is randomized so retries of many pages do not line up.
+SCRAPE_RETRY_BUDGET = int(os.getenv("SCRAPE_RETRY_BUDGET", "6"))
+SCRAPE_RETRY_JITTER = float(os.getenv("SCRAPE_RETRY_JITTER", "0.5"))
+
+
+def backoff_delay(
+    attempt: int,
+    backoff_factor: float = 1.5,
+    retry_after: Optional[float] = None,
+    jitter: float = SCRAPE_RETRY_JITTER,
+) -> float:
+    """
+    Get the seconds to wait before retrying a failed attempt.
+
+    The delay grows exponentially with the attempt and the last `jitter`
+    share of it is random ("equal jitter"). A server's Retry-After is
+    never undercut.
+
+    Args:
+        attempt: Number of the failed attempt, starting at 0
+        backoff_factor: Delay after the first failed attempt
+        retry_after: Seconds the server asked us to wait, if any
+        jitter: Share of the delay that is randomized, from 0 to 1
+
+    Returns:
+        float: Seconds to wait
+    """
+    delay = backoff_factor * (2**attempt)
+    delay *= 1 - jitter * random.random()
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+class RetryBudget:
+    """
+    Thread-safe allowance of retries shared by the pages of one question.
+
+    Pages are retried at most max_attempts - 1 times each, and all of them
+    together at most `retries` times, so a batch of failing hosts cannot
+    keep the question waiting.
+    """
+
+    def __init__(
+        self,
+        retries: int = SCRAPE_RETRY_BUDGET,
+        max_attempts: int = 3,
+        backoff_factor: float = 1.5,
+    ):
+        self.retries = retries
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self._lock = threading.Lock()
+
+    def next_delay(
+        self, attempt: int, retry_after: Optional[float] = None
+    ) -> Optional[float]:
+        """
+        Spend a retry on a failed attempt if any are left.
+
+        Args:
+            attempt: Number of the failed attempt, starting at 0
+            retry_after: Seconds the server asked us to wait, if any
+
+        Returns:
+            float: Seconds to wait before the retry, or None to give up
+        """
+        with self._lock:
+            allowed = attempt + 1 < self.max_attempts and self.retries > 0
+            if allowed:
+                self.retries -= 1
+        get_registry().inc(
+            "scrape_retries_total",
+            help_text="Failed scrape attempts by decision: scheduled or "
+            "exhausted",
+            result="scheduled" if allowed else "exhausted",
+        )
+        if not allowed:
+            return None
+        return backoff_delay(attempt, self.backoff_factor, retry_after)
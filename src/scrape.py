@@ -1,29 +1,227 @@
 """Module to scrape the sources' text."""
 
+import codecs
+import os
+import re
+import threading
+import charset_normalizer
 import requests
-from bs4 import BeautifulSoup
 import time
-from typing import Optional
-import re
+from typing import Iterator, Optional
 from urllib.parse import urlparse
-import streamlit as st
+from dotenv import load_dotenv
+from .domain_health import (
+    SCRAPE_MAX_RETRY_AFTER,
+    domain_of,
+    get_domain_health,
+    parse_retry_after,
+)
+from .http_pool import get_session
+from .metrics import get_registry
+from .page_cache import get_page_cache
+from .retry import backoff_delay
+from .tracing import span
+from .extract import extract_chunks
+
+load_dotenv()
+
+# Wall-clock budget (in seconds) for scraping all sources of a single
+# question.
+SCRAPE_DEADLINE = float(os.getenv("SCRAPE_DEADLINE", "15"))
+
+# Maximum characters of main text kept per page (well above what the prompt
+# budget takes from a page, so passage ranking rather than this cap decides
+# what the model sees), maximum (decompressed) body bytes downloaded per
+# page, and the size of each streamed chunk.
+MAX_CHARS = int(os.getenv("SCRAPE_MAX_CHARS", "40000"))
+SCRAPE_MAX_BYTES = int(os.getenv("SCRAPE_MAX_BYTES", str(2 * 1024 * 1024)))
+SCRAPE_CHUNK_SIZE = 64 * 1024
+
+_CHARSET_HEADER = re.compile(r"charset=[\"']?([\w.:-]+)", re.IGNORECASE)
+_CHARSET_META = re.compile(
+    rb"<meta[^>]+charset=[\"']?([\w.:-]+)", re.IGNORECASE
+)
+
+
+# Statuses worth retrying; every other error status is permanent. Of the
+# permanent ones, these concern the page rather than the whole domain.
+RETRYABLE_STATUSES = frozenset((408, 425, 429, 500, 502, 503, 504))
+PAGE_ERROR_STATUSES = frozenset((404, 410))
+
+
+class ScrapeSkipped(Exception):
+    """Raised when a page is not scraped now, so it is not given up on."""
+
+
+class ScrapeCancelled(ScrapeSkipped):
+    """Raised when a scrape is no longer needed."""
+
+
+class DomainUnavailable(ScrapeSkipped):
+    """Raised when the circuit of a page's domain is open."""
+
+
+class RetryLater(ScrapeSkipped):
+    """Raised instead of waiting when the caller schedules retries."""
+
+    def __init__(self, url: str, retry_after: Optional[float] = None):
+        super().__init__(url)
+        self.retry_after = retry_after
+
+
+def detect_encoding(content_type: str, first_chunk: bytes) -> str:
+    """
+    Pick the character encoding of a page from its first chunk.
+
+    Checks, in order, the Content-Type charset, a byte order mark, a
+    <meta charset> declaration and a statistical guess, falling back to
+    UTF-8.
+
+    Args:
+        content_type: The Content-Type response header
+        first_chunk: The first bytes of the body
+
+    Returns:
+        str: A codec name known to Python
+    """
+    declared = []
+    match = _CHARSET_HEADER.search(content_type)
+    if match:
+        declared.append(match.group(1))
+    if first_chunk.startswith(codecs.BOM_UTF8):
+        declared.append("utf-8-sig")
+    elif first_chunk.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        declared.append("utf-16")
+    match = _CHARSET_META.search(first_chunk[:4096])
+    if match:
+        declared.append(match.group(1).decode("ascii"))
+
+    for candidate in declared:
+        try:
+            return codecs.lookup(candidate).name
+        except LookupError:
+            continue
+
+    # Nothing usable was declared, so guess. ASCII is widened to UTF-8 since
+    # later chunks may contain non-ASCII text.
+    best = charset_normalizer.from_bytes(first_chunk).best()
+    if best is not None and best.encoding != "ascii":
+        return codecs.lookup(best.encoding).name
+    return "utf-8"
+
+
+def iter_decoded_body(
+    response: requests.Response, max_bytes: Optional[int] = None
+) -> Iterator[str]:
+    """
+    Stream a response body as decoded text within a byte budget.
+
+    The encoding is detected once, from the first chunk, and the rest of the
+    body is decoded incrementally. Reading stops when the budget is spent or
+    when the consumer stops iterating.
+
+    Args:
+        response: A response opened with stream=True
+        max_bytes: Maximum body bytes to read, defaults to SCRAPE_MAX_BYTES
+
+    Yields:
+        Decoded text chunks
+    """
+    budget = SCRAPE_MAX_BYTES if max_bytes is None else max_bytes
+    decoder = None
+    received = 0
+    for chunk in response.iter_content(SCRAPE_CHUNK_SIZE):
+        if decoder is None:
+            encoding = detect_encoding(
+                response.headers.get("Content-Type", ""), chunk
+            )
+            decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        chunk = chunk[: budget - received]
+        received += len(chunk)
+        yield decoder.decode(chunk)
+        if received >= budget:
+            print(
+                f"Stopped reading {response.url} at the {budget} byte budget"
+            )
+            break
+    if decoder is not None:
+        yield decoder.decode(b"", final=True)
+
+
+def _extract_body(
+    response: requests.Response, cancel: Optional[threading.Event] = None
+) -> str:
+    """
+    Extract the main text of a streamed response inside a "body" span.
+
+    Download and parsing are interleaved, so the span records the seconds
+    spent waiting for and decoding chunks as "download" and the rest as
+    "parse".
+
+    Args:
+        response: The streamed response
+        cancel: Stops the download between chunks when set
+
+    Returns:
+        str: The cleaned main text content
+
+    Raises:
+        ScrapeCancelled: If cancel was set during the download
+    """
+    with span("body") as body_span:
+        download = 0.0
+
+        def timed_chunks() -> Iterator[str]:
+            nonlocal download
+            body = iter_decoded_body(response)
+            while True:
+                start = time.perf_counter()
+                chunk = next(body, None)
+                download += time.perf_counter() - start
+                if chunk is None:
+                    return
+                if cancel is not None and cancel.is_set():
+                    raise ScrapeCancelled(response.url)
+                yield chunk
+
+        # Extract the main text with the configured backend, stopping the
+        # download once enough text has been found
+        main_content = extract_chunks(timed_chunks(), max_chars=MAX_CHARS)
+        body_span.set(download=download, parse=body_span.duration - download)
+    return main_content
 
 
-@st.cache_data
 def scrape_page(
-    url: str, max_retries: int = 3, backoff_factor: float = 1.5
+    url: str,
+    max_retries: int = 3,
+    backoff_factor: float = 1.5,
+    _cancel: Optional[threading.Event] = None,
+    _defer_retries: bool = False,
 ) -> Optional[str]:
     """
     Extract main text content from a webpage with robust error handling and
     retries.
 
+    Results are memoized only by the persistent page cache, so its TTL and
+    ETag/Last-Modified revalidation apply within a running process too.
+
     Args:
         url: The URL to scrape
         max_retries: Maximum number of retry attempts
         backoff_factor: Factor to increase wait time between retries
+        _cancel: When set, the scrape stops at the next chunk or retry
+        _defer_retries: Make a single attempt and raise RetryLater after a
+            transient failure instead of waiting, so the caller can run
+            other work while it schedules the retry
 
     Returns:
         str: Extracted text content or empty string if extraction fails
+
+    Raises:
+        ScrapeCancelled: If _cancel was set before the page was scraped
+        DomainUnavailable: If the circuit of the page's domain is open
+        RetryLater: If _defer_retries is set and the attempt failed
+            transiently
     """
     # Validate URL
     try:
@@ -44,102 +242,117 @@ def scrape_page(
         "Accept-Language": "en-US,en;q=0.5",
     }
 
-    # Retry logic with exponential backoff
+    # Serve fresh pages from the persistent cache; stale ones are revalidated
+    # with a conditional request so an unchanged page costs only a 304.
+    page_cache = get_page_cache()
+    with span("cache_lookup") as cache_span:
+        cached = page_cache.get(url) if page_cache else None
+        cache_span.set(hit=bool(cached), fresh=bool(cached and cached.fresh))
+    if page_cache:
+        get_registry().inc(
+            "page_cache_lookups_total",
+            help_text="Page cache lookups by result: fresh, stale, miss",
+            result=(
+                "miss" if not cached else "fresh" if cached.fresh else "stale"
+            ),
+        )
+    if cached:
+        if cached.fresh:
+            return cached.text
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+
+    # Retry logic with jittered exponential backoff. Known-bad domains are
+    # skipped, permanent errors are not retried and a 429's Retry-After is
+    # honored.
+    health = get_domain_health()
+    domain = domain_of(url)
     for attempt in range(max_retries):
+        if _cancel is not None and _cancel.is_set():
+            raise ScrapeCancelled(url)
+        if not health.allow(domain):
+            print(f"Skipping {url}: {domain} is failing")
+            raise DomainUnavailable(url)
+        retry_after = None
+        started = time.perf_counter()
         try:
-            response = requests.get(
-                url, headers=headers, timeout=10, allow_redirects=True
-            )
-            response.raise_for_status()
-
-            # Check if content is HTML
-            content_type = response.headers.get("Content-Type", "").lower()
-            if (
-                "text/html" not in content_type
-                and "application/xhtml+xml" not in content_type
-            ):
-                print(f"Skipping non-HTML content: {content_type} for {url}")
-                return ""
-
-            soup = BeautifulSoup(response.text, "html.parser")
-
-            # Remove unwanted elements
-            for element in soup(
-                [
-                    "script",
-                    "style",
-                    "nav",
-                    "footer",
-                    "header",
-                    "aside",
-                    "noscript",
-                    "iframe",
-                    "svg",
-                    "form",
-                ]
-            ):
-                element.decompose()
-
-            # Try to get main content elements
-            main_content = ""
-
-            # Try method 1: Find article or main tags
-            content_elements = soup.find_all(
-                ["article", "main", "div"],
-                class_=re.compile(r"(content|article|post|entry|text)"),
-            )
-            if content_elements:
-                for element in content_elements:
-                    main_content += element.get_text(
-                        separator=" ", strip=True
-                    ) + " "
-
-            # If main content sections weren't found, use paragraphs
-            if not main_content:
-                paragraphs = soup.find_all("p")
-                main_content = " ".join(
-                    p.get_text(strip=True)
-                    for p in paragraphs
-                    if len(p.get_text(strip=True)) > 40
+            # Stream the body so large pages can be cut short; the response
+            # is closed on every path so its connection goes back to the pool.
+            # The request span covers connecting and waiting for headers.
+            with span("request", attempt=attempt + 1) as request_span:
+                response = get_session().get(
+                    url,
+                    headers=headers,
+                    timeout=10,
+                    allow_redirects=True,
+                    stream=True,
                 )
+                request_span.set(status=response.status_code)
+            with response:
+                response.raise_for_status()
+
+                if response.status_code == 304 and cached and page_cache:
+                    get_registry().inc(
+                        "page_cache_not_modified_total",
+                        help_text="Stale pages revalidated with a 304",
+                    )
+                    health.record_success(
+                        domain, time.perf_counter() - started
+                    )
+                    page_cache.refresh(url)
+                    return cached.text
 
-            # If still no content, try getting all text
-            if not main_content:
-                main_content = soup.get_text(separator=" ", strip=True)
+                # Check if content is HTML
+                content_type = response.headers.get(
+                    "Content-Type", ""
+                ).lower()
+                if (
+                    "text/html" not in content_type
+                    and "application/xhtml+xml" not in content_type
+                ):
+                    print(
+                        f"Skipping non-HTML content: {content_type} for {url}"
+                    )
+                    health.record_rejection(domain)
+                    return ""
 
-            # Clean up the text
-            main_content = re.sub(
-                r"\s+", " ", main_content
-            )  # Replace multiple spaces with single space
-            main_content = re.sub(
-                r"[\n\r\t]+", " ", main_content
-            )  # Remove newlines and tabs
+                main_content = _extract_body(response, _cancel)
+            health.record_success(domain, time.perf_counter() - started)
 
             # Limit content length to avoid token issues
-            MAX_CHARS = 8000
             if len(main_content) > MAX_CHARS:
                 main_content = main_content[:MAX_CHARS] + "..."
 
+            if page_cache and main_content:
+                page_cache.put(
+                    url,
+                    main_content,
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                )
+
             return main_content
 
         except requests.exceptions.HTTPError as e:
-            if hasattr(e, "response") and e.response.status_code in [
-                403,
-                404,
-                429,
-                500,
-                502,
-                503,
-            ]:
-                print(
-                    f"HTTP error {e.response.status_code} for {url}: {str(e)}"
+            status = e.response.status_code if e.response is not None else 0
+            print(f"HTTP error {status} for {url}: {str(e)}")
+            if status == 429 and e.response is not None:
+                retry_after = parse_retry_after(
+                    e.response.headers.get("Retry-After")
                 )
-                if attempt == max_retries - 1:
-                    return ""
+            if status in PAGE_ERROR_STATUSES:
+                health.record_rejection(domain)
             else:
-                print(f"HTTP error for {url}: {str(e)}")
-                if attempt == max_retries - 1:
-                    return ""
+                health.record_failure(domain, retry_after)
+            if status not in RETRYABLE_STATUSES:
+                return ""
+            if (
+                retry_after is not None
+                and retry_after > SCRAPE_MAX_RETRY_AFTER
+            ):
+                return ""
 
         except (
             requests.exceptions.ConnectionError,
@@ -147,19 +360,29 @@ def scrape_page(
             requests.exceptions.TooManyRedirects,
         ) as e:
             print(f"Connection error for {url}: {str(e)}")
-            if attempt == max_retries - 1:
-                return ""
+            health.record_failure(domain)
+
+        except ScrapeCancelled:
+            raise
 
         except Exception as e:
             print(f"Unexpected error scraping {url}: {str(e)}")
             return ""
 
-        # Wait before retrying with exponential backoff
-        wait_time = backoff_factor * (2**attempt)
+        # The attempt failed transiently: hand the retry to the caller's
+        # scheduler, or wait here if there is none
+        if _defer_retries:
+            raise RetryLater(url, retry_after)
+        if attempt == max_retries - 1:
+            return ""
+        wait_time = backoff_delay(attempt, backoff_factor, retry_after)
         print(
             f"Retrying {url} in {wait_time:.1f} seconds... "
             f"(Attempt {attempt + 1}/{max_retries})"
         )
-        time.sleep(wait_time)
+        if _cancel is not None:
+            _cancel.wait(wait_time)
+        else:
+            time.sleep(wait_time)
 
     return ""
@@ -2,45 +2,77 @@
 
 import json
 import os
+from functools import partial
 import requests
 from dotenv import load_dotenv
-import streamlit as st
+from .http_pool import get_session
+from .search_cache import get_search_cache
+from .tracing import span
 
 load_dotenv()
 
+# Country whose results the search API returns (Serper "gl" code) and the
+# number of results requested per query.
+SEARCH_REGION = os.getenv("SEARCH_REGION", "ke")
+SEARCH_NUM_RESULTS = int(os.getenv("SEARCH_NUM_RESULTS", "10"))
 
-@st.cache_data
-def search_web(query: str) -> list[dict]:
+
+def _fetch_results(
+    query: str, api_key: str, num_results: int, region: str
+) -> list[dict]:
+    """
+    Make one Serper API call.
+
+    Raises:
+        requests.RequestException: If the request fails
+    """
+    url = "https://google.serper.dev/search"
+    payload = json.dumps({"q": query, "gl": region, "num": num_results})
+    headers = {"X-API-KEY": api_key, "Content-Type": "application/json"}
+    with span("request") as request_span:
+        response = get_session().post(
+            url, headers=headers, data=payload, timeout=10
+        )
+        request_span.set(status=response.status_code)
+    response.raise_for_status()
+    raw_results = response.json()
+    results = raw_results.get("organic", [])
+    return [
+        {"title": r["title"], "url": r["link"]}
+        for r in results[:num_results]
+    ]
+
+
+def search_web(
+    query: str,
+    num_results: int = SEARCH_NUM_RESULTS,
+    region: str = SEARCH_REGION,
+) -> list[dict]:
     """
-    Query a web search API and return up to 5 organic results with title and
-    URL.
+    Query a web search API and return up to num_results organic results with
+    title and URL.
+
+    Results are cached per query with a TTL; identical concurrent queries
+    share one API call and stale results are refreshed in the background.
 
     Args:
         query: The search query
+        num_results: Maximum number of results
+        region: Country code of the results, e.g. "ke" or "us"
 
     Returns:
         list: List of dictionaries containing title and url for each result
     """
     api_key = os.getenv("SEARCH_API_KEY")
-    url = "https://google.serper.dev/search"
     if not api_key:
         raise ValueError("SEARCH_API_KEY not set.")
-    if not url:
-        raise ValueError("URL not set in environment variables.")
 
-    payload = json.dumps({"q": query, "gl": "ke"})
-    headers = {"X-API-KEY": api_key, "Content-Type": "application/json"}
+    # Queries differing only in case or spacing share a cache entry
+    key = (" ".join(query.lower().split()), num_results, region.lower())
     try:
-        response = requests.post(
-            url, headers=headers, data=payload, timeout=10
+        return get_search_cache().get(
+            key, partial(_fetch_results, query, api_key, num_results, region)
         )
-        response.raise_for_status()
-        raw_results = response.json()
-        results = raw_results.get("organic", [])
-        parsed_results = [
-            {"title": r["title"], "url": r["link"]} for r in results[:5]
-        ]
-        return parsed_results
     except requests.RequestException as e:
         print(f"Search error: {e}")
         return []
@@ -0,0 +1,162 @@
+"""
+Module providing a search result cache with request coalescing.
+"""
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional
+
+from dotenv import load_dotenv
+
+from .metrics import get_registry
+
+load_dotenv()
+
+# Seconds search results are fresh, seconds after that during which stale
+# results are still served while they are refreshed in the background, and
+# the maximum number of cached queries (0 disables the cache).
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "900"))
+SEARCH_CACHE_STALE = float(os.getenv("SEARCH_CACHE_STALE", "86400"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+
+
+class _Entry(NamedTuple):
+    value: Any
+    fetched_at: float
+
+
+class SearchCache:
+    """
+    Thread-safe TTL cache that makes one upstream call per key at a time.
+
+    Fresh entries are returned directly. Entries past the TTL but within the
+    stale window are returned as well while one background refresh replaces
+    them (stale-while-revalidate). On a miss, the first caller fetches and
+    concurrent callers for the same key wait for its result instead of
+    fetching themselves (singleflight). Failed fetches are not cached.
+    """
+
+    def __init__(
+        self,
+        ttl: float = SEARCH_CACHE_TTL,
+        stale: float = SEARCH_CACHE_STALE,
+        max_entries: int = SEARCH_CACHE_SIZE,
+    ):
+        self.ttl = ttl
+        self.stale = stale
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: Dict[Hashable, Future] = {}
+
+    def get(self, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        """
+        Get the cached value for a key, fetching it if needed.
+
+        Args:
+            key: The cache key, e.g. the normalized query
+            fetch: Makes the upstream call; exceptions propagate to every
+                caller waiting for it
+
+        Returns:
+            A copy of the cached or fetched value
+        """
+        now = time.time()
+        refresh: Optional[Future] = None
+        with self._lock:
+            entry = self._entries.get(key)
+            age = now - entry.fetched_at if entry is not None else None
+            if age is not None and age < self.ttl + self.stale:
+                self._entries.move_to_end(key)
+                result = "fresh" if age < self.ttl else "stale"
+                if result == "stale" and key not in self._inflight:
+                    refresh = self._inflight[key] = Future()
+                value = entry.value
+            else:
+                future = self._inflight.get(key)
+                result = "miss" if future is None else "coalesced"
+                if future is None:
+                    future = self._inflight[key] = Future()
+        self._count(result)
+
+        if result in ("fresh", "stale"):
+            if refresh is not None:
+                threading.Thread(
+                    target=self._refresh,
+                    args=(key, fetch, refresh),
+                    name="search-refresh",
+                    daemon=True,
+                ).start()
+            return copy.deepcopy(value)
+
+        if result == "miss":
+            self._fetch(key, fetch, future)
+        return copy.deepcopy(future.result())
+
+    def clear(self) -> None:
+        """Delete every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _fetch(
+        self, key: Hashable, fetch: Callable[[], Any], future: Future
+    ) -> None:
+        try:
+            value = fetch()
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            return
+        with self._lock:
+            if self.max_entries > 0:
+                self._entries[key] = _Entry(value, time.time())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            self._inflight.pop(key, None)
+        future.set_result(value)
+
+    def _refresh(
+        self, key: Hashable, fetch: Callable[[], Any], future: Future
+    ) -> None:
+        self._fetch(key, fetch, future)
+        error = future.exception()
+        if error is not None:
+            print(f"Search refresh failed, keeping stale results: {error}")
+
+    @staticmethod
+    def _count(result: str) -> None:
+        get_registry().inc(
+            "search_cache_lookups_total",
+            help_text="Search cache lookups by result: fresh, stale, miss, "
+            "coalesced",
+            result=result,
+        )
+
+
+_search_cache: Optional[SearchCache] = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """
+    Get the process-wide search cache.
+
+    Returns:
+        SearchCache: The cache
+    """
+    global _search_cache
+    if _search_cache is None:
+        with _search_cache_lock:
+            if _search_cache is None:
+                _search_cache = SearchCache()
+    return _search_cache
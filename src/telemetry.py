@@ -2,46 +2,174 @@
 Module to track telemetry data such as token counts and latency.
 """
 
-import tiktoken
-from typing import Dict, List, Any, Optional
+import hashlib
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Any, Optional, Tuple
 
+import tiktoken
 from dotenv import load_dotenv
 
+from .metrics import get_registry
+from .token_estimate import TokenEstimator
+
 load_dotenv()
 
+# How telemetry counts tokens: "exact" (tiktoken) or "estimate" (per-script
+# character model, see src/token_estimate.py).
+TOKEN_COUNT_MODE = os.getenv("TOKEN_COUNT_MODE", "exact")
+
+# Number of token counts remembered by content hash, threads used by
+# tiktoken to encode a batch, and seconds before loading the tokenizer is
+# tried again after it failed (it is downloaded on first use).
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+TOKENIZER_THREADS = int(os.getenv("TOKENIZER_THREADS", "4"))
+TOKENIZER_RETRY_AFTER = float(os.getenv("TOKENIZER_RETRY_AFTER", "60"))
+
+# Finished requests that can wait for background telemetry before new ones
+# are dropped.
+TELEMETRY_QUEUE_SIZE = int(os.getenv("TELEMETRY_QUEUE_SIZE", "256"))
+
+_tokenizer: Optional[tiktoken.Encoding] = None
+_tokenizer_error: Optional[Exception] = None
+_tokenizer_failed_at = 0.0
+_tokenizer_lock = threading.Lock()
+_token_counts: "OrderedDict[bytes, int]" = OrderedDict()
+_token_counts_lock = threading.Lock()
+
 
 # Initialize encoder for token counting
-def get_tokenizer():
+def get_tokenizer() -> tiktoken.Encoding:
     """
     Get the cl100k_base tokenizer for token counting.
 
+    The encoder is loaded once and kept for the process. If loading fails,
+    the error is remembered and raised again without retrying for
+    TOKENIZER_RETRY_AFTER seconds, so callers fall back to an approximation
+    without paying for the failed load on every call, and a passing network
+    error does not disable exact counts for the life of the process.
+
     Note: Using cl100k_base as a general-purpose tokenizer since tiktoken does
     not support Gemini models directly. This provides a reasonable
     approximation for token counts.
     """
-    return tiktoken.get_encoding("cl100k_base")
+    global _tokenizer, _tokenizer_error, _tokenizer_failed_at
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                if (
+                    _tokenizer_error is not None
+                    and time.monotonic() - _tokenizer_failed_at
+                    < TOKENIZER_RETRY_AFTER
+                ):
+                    raise _tokenizer_error
+                try:
+                    _tokenizer = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    _tokenizer_error = e
+                    _tokenizer_failed_at = time.monotonic()
+                    raise
+                _tokenizer_error = None
+    return _tokenizer
 
 
-def count_tokens(text: str) -> int:
+def _text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def exact_count_tokens_batch(texts: List[str]) -> List[int]:
     """
-    Count tokens accurately using tiktoken library.
+    Count tokens for several texts with one batched tokenizer call.
+
+    Counts are remembered by content hash, so text that was already counted,
+    such as a source page seen by an earlier question, is not encoded again.
+    Unlike count_tokens_batch, tokenizer errors are raised.
 
     Args:
-        text: The text to count tokens for.
+        texts: The texts to count tokens for.
 
     Returns:
-        int: Number of tokens in the text.
+        list: Number of tokens in each text, in the same order.
+    """
+    counts: List[Optional[int]] = [0 if not text else None for text in texts]
+    keys: Dict[int, bytes] = {}
+    with _token_counts_lock:
+        for idx, text in enumerate(texts):
+            if counts[idx] is not None:
+                continue
+            key = _text_key(text)
+            keys[idx] = key
+            if key in _token_counts:
+                _token_counts.move_to_end(key)
+                counts[idx] = _token_counts[key]
+
+    missing = [idx for idx, count in enumerate(counts) if count is None]
+    if not missing:
+        return [int(count or 0) for count in counts]
+
+    # Identical texts in one batch are encoded once
+    unique = list(dict.fromkeys(texts[idx] for idx in missing))
+    encoded = get_tokenizer().encode_ordinary_batch(
+        unique, num_threads=TOKENIZER_THREADS
+    )
+    unique_counts = {text: len(e) for text, e in zip(unique, encoded)}
+
+    with _token_counts_lock:
+        for idx in missing:
+            counts[idx] = unique_counts[texts[idx]]
+            _token_counts[keys[idx]] = unique_counts[texts[idx]]
+        while len(_token_counts) > TOKEN_CACHE_SIZE:
+            _token_counts.popitem(last=False)
+    return [int(count or 0) for count in counts]
+
+
+def count_tokens_batch(texts: List[str]) -> List[int]:
     """
-    if not text:
-        return 0
+    Count tokens for several texts, approximating if tiktoken fails.
 
+    Args:
+        texts: The texts to count tokens for.
+
+    Returns:
+        list: Number of tokens in each text, in the same order.
+    """
     try:
-        encoder = get_tokenizer()
-        return len(encoder.encode(text))
+        return exact_count_tokens_batch(texts)
     except Exception as e:
         # Fallback to approximation if tiktoken fails
         print(f"Token counting error: {e}")
-        return len(text) // 4  # Rough approximation (1 token ≈ 4 chars)
+        # Rough approximation (1 token ≈ 4 chars)
+        return [len(text) // 4 for text in texts]
+
+
+_estimator = TokenEstimator(exact_count_tokens_batch)
+
+
+def get_estimator() -> TokenEstimator:
+    """
+    Get the process-wide token estimator used in estimate mode.
+
+    Returns:
+        TokenEstimator: The estimator, sampling exact counts from tiktoken
+    """
+    return _estimator
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens accurately using tiktoken library.
+
+    Args:
+        text: The text to count tokens for.
+
+    Returns:
+        int: Number of tokens in the text.
+    """
+    return count_tokens_batch([text])[0]
 
 
 def track_telemetry(
@@ -62,21 +190,20 @@ def track_telemetry(
     Returns:
         dict: Dictionary with token counts and other telemetry data.
     """
-    # Calculate input tokens
-    input_text = question
-    input_tokens = count_tokens(input_text)
-
-    # Add tokens from scraped content
-    source_tokens = 0
-    for source in sources:
-        url = source.get("url", "")
-        if url in scraped_texts and scraped_texts[url]:
-            source_tokens += count_tokens(scraped_texts[url])
+    source_texts = [
+        scraped_texts.get(source.get("url", ""), "") for source in sources
+    ]
 
-    # Calculate output tokens
-    output_tokens = count_tokens(answer) if answer else 0
+    # Count the question, every source and the answer in one batch
+    texts = [question, answer or ""] + source_texts
+    if TOKEN_COUNT_MODE == "estimate":
+        counts = _estimator.estimate(texts)
+    else:
+        counts = count_tokens_batch(texts)
+    input_tokens, output_tokens = counts[0], counts[1]
+    source_tokens = sum(counts[2:])
 
-    return {
+    telemetry = {
         "input_tokens": input_tokens,
         "source_tokens": source_tokens,
         "output_tokens": output_tokens,
@@ -85,4 +212,203 @@ def track_telemetry(
         "source_count": len(sources),
         "question_length": len(question),
         "answer_length": len(answer) if answer else 0,
+        "token_count_mode": TOKEN_COUNT_MODE,
     }
+    if TOKEN_COUNT_MODE == "estimate":
+        telemetry["token_estimate_error"] = _estimator.error_stats()[
+            "mean_error"
+        ]
+    return telemetry
+
+
+class TelemetryRecorder:
+    """
+    Background worker that turns raw request events into telemetry.
+
+    record() only queues references to the request data, so the request path
+    does not pay for copying or token counting; a daemon thread computes the
+    counts and the running aggregates. Callers must not modify the data
+    after recording it. Each call returns a Future that resolves to the
+    telemetry dict once it is ready. When the queue is full, events are
+    dropped rather than slowing down requests.
+    """
+
+    def __init__(self, max_pending: int = TELEMETRY_QUEUE_SIZE):
+        """
+        Args:
+            max_pending: Events that can wait to be processed
+        """
+        self._queue: "queue.Queue[Tuple[Dict[str, Any], Future]]" = (
+            queue.Queue(maxsize=max_pending)
+        )
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._totals: Dict[str, float] = {
+            "requests": 0,
+            "dropped": 0,
+            "input_tokens": 0,
+            "source_tokens": 0,
+            "output_tokens": 0,
+            "total_tokens": 0,
+            "latency": 0.0,
+        }
+
+    def record(
+        self,
+        question: str,
+        sources: List[Dict[str, str]],
+        scraped_texts: Dict[str, str],
+        answer: Optional[str] = None,
+        **timings: Any,
+    ) -> "Future[Dict[str, Any]]":
+        """
+        Queue a finished request for telemetry.
+
+        Args:
+            question: The user's question.
+            sources: List of dictionaries containing title and url for each
+                source.
+            scraped_texts: Dictionary mapping source URLs to their scraped
+                text.
+            answer: The generated answer text (optional).
+            **timings: Measurements added to the telemetry as they are, such
+                as latency and time_to_first_token.
+
+        Returns:
+            Future: Resolves to the dict returned by track_telemetry with the
+            timings merged in
+        """
+        future: "Future[Dict[str, Any]]" = Future()
+        event = {
+            "question": question,
+            "sources": sources,
+            "scraped_texts": scraped_texts,
+            "answer": answer,
+            "timings": timings,
+        }
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((event, future))
+        except queue.Full:
+            with self._lock:
+                self._totals["dropped"] += 1
+            future.set_exception(RuntimeError("Telemetry queue is full"))
+        return future
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="telemetry", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            event, future = self._queue.get()
+            try:
+                if future.set_running_or_notify_cancel():
+                    telemetry = track_telemetry(
+                        event["question"],
+                        event["sources"],
+                        event["scraped_texts"],
+                        event["answer"],
+                    )
+                    telemetry.update(event["timings"])
+                    self._aggregate(telemetry)
+                    future.set_result(telemetry)
+            except Exception as e:
+                print(f"Telemetry error: {e}")
+                future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    def _aggregate(self, telemetry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._totals["requests"] += 1
+            for key in (
+                "input_tokens", "source_tokens", "output_tokens",
+                "total_tokens", "latency",
+            ):
+                self._totals[key] += telemetry.get(key) or 0
+
+        registry = get_registry()
+        for kind in ("input", "source", "output", "total"):
+            registry.observe(
+                "question_tokens", telemetry.get(f"{kind}_tokens") or 0,
+                help_text="Tokens per question by kind", kind=kind,
+            )
+        if telemetry.get("latency") is not None:
+            registry.observe(
+                "question_latency_seconds", telemetry["latency"],
+                help_text="End-to-end latency of answered questions",
+            )
+        if telemetry.get("time_to_first_token") is not None:
+            registry.observe(
+                "time_to_first_token_seconds",
+                telemetry["time_to_first_token"],
+                help_text="Seconds until the first answer token",
+            )
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued event has been processed.
+
+        Args:
+            timeout: Maximum seconds to wait, or None to wait indefinitely
+
+        Returns:
+            bool: True if the queue was drained
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Get aggregates over every request processed so far.
+
+        Returns:
+            dict: Request and dropped event counts, token totals, and the
+            mean latency in seconds
+        """
+        with self._lock:
+            summary = dict(self._totals)
+        requests = summary["requests"]
+        summary["mean_latency"] = (
+            summary["latency"] / requests if requests else 0.0
+        )
+        return summary
+
+
+_recorder = TelemetryRecorder()
+
+
+def record_telemetry(
+    question: str,
+    sources: List[Dict[str, str]],
+    scraped_texts: Dict[str, str],
+    answer: Optional[str] = None,
+    **timings: Any,
+) -> "Future[Dict[str, Any]]":
+    """
+    Queue telemetry for a finished request on the process-wide recorder.
+
+    See TelemetryRecorder.record.
+    """
+    return _recorder.record(
+        question, sources, scraped_texts, answer, **timings
+    )
+
+
+def get_telemetry_summary() -> Dict[str, float]:
+    """
+    Get aggregates over every request processed by the recorder.
+
+    Returns:
+        dict: See TelemetryRecorder.summary
+    """
+    return _recorder.summary()
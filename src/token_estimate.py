@@ -0,0 +1,197 @@
+"""
+Module to estimate token counts from character counts without a tokenizer.
+"""
+
+import os
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Every how many estimated batches exact counts are also computed to measure
+# the error, how many sampled texts are kept, and the mean relative error
+# above which the model is refitted on the samples.
+TOKEN_ESTIMATE_SAMPLE_EVERY = int(
+    os.getenv("TOKEN_ESTIMATE_SAMPLE_EVERY", "50")
+)
+TOKEN_ESTIMATE_SAMPLES = int(os.getenv("TOKEN_ESTIMATE_SAMPLES", "256"))
+TOKEN_ESTIMATE_MAX_ERROR = float(
+    os.getenv("TOKEN_ESTIMATE_MAX_ERROR", "0.15")
+)
+
+# Code point ranges grouped by how cl100k_base tokenizes them, with the
+# starting tokens per character of each group.
+SCRIPT_CLASSES: List[Tuple[str, int, float]] = [
+    ("ascii", 0x0000, 0.25),  # English and code: about 4 chars per token
+    ("latin", 0x0080, 0.6),  # Accented Latin letters
+    ("greek_cyrillic", 0x0250, 0.5),
+    ("other_alphabets", 0x0530, 0.9),  # Hebrew, Arabic, Indic, Thai, ...
+    ("symbols", 0x1100, 0.7),  # Punctuation, arrows, math, box drawing
+    ("cjk", 0x3000, 1.2),  # Chinese and Japanese
+    ("hangul_other", 0xA000, 1.0),
+    ("astral", 0x10000, 2.0),  # Emoji and rare scripts
+]
+
+_BOUNDARIES = np.array([start for _, start, _ in SCRIPT_CLASSES[1:]])
+_DEFAULT_RATES = np.array([rate for _, _, rate in SCRIPT_CLASSES])
+
+ExactCounter = Callable[[List[str]], List[int]]
+
+
+def script_counts(texts: List[str]) -> np.ndarray:
+    """
+    Count the characters of every text in each script class.
+
+    ASCII-only texts, the common case, are counted from their length; the
+    others are converted to one code point array and classified at once.
+
+    Args:
+        texts: The texts to count
+
+    Returns:
+        ndarray: One row per text with a character count per script class
+    """
+    counts = np.zeros((len(texts), len(SCRIPT_CLASSES)))
+    mixed = []
+    for idx, text in enumerate(texts):
+        if text.isascii():
+            counts[idx, 0] = len(text)
+        else:
+            mixed.append(idx)
+    if not mixed:
+        return counts
+
+    classes = len(SCRIPT_CLASSES)
+    joined = "".join(texts[idx] for idx in mixed).encode("utf-32-le")
+    code_points = np.frombuffer(joined, dtype=np.uint32)
+    lengths = np.fromiter((len(texts[idx]) for idx in mixed), dtype=np.int64)
+    text_ids = np.repeat(np.arange(len(mixed)), lengths)
+    class_ids = np.searchsorted(_BOUNDARIES, code_points, side="right")
+    flat = np.bincount(
+        text_ids * classes + class_ids, minlength=len(mixed) * classes
+    )
+    counts[mixed] = flat.reshape(len(mixed), classes)
+    return counts
+
+
+class TokenEstimator:
+    """
+    Per-script linear model from character counts to token counts.
+
+    Estimates are a dot product of per-script character counts and tokens
+    per character, computed for a whole batch of texts with numpy. Every
+    sample_every-th batch is also counted exactly to track the relative
+    error, and when the mean error exceeds max_error the rates are refitted
+    on the sampled texts with least squares.
+    """
+
+    def __init__(
+        self,
+        exact_counter: ExactCounter,
+        sample_every: int = TOKEN_ESTIMATE_SAMPLE_EVERY,
+        max_samples: int = TOKEN_ESTIMATE_SAMPLES,
+        max_error: float = TOKEN_ESTIMATE_MAX_ERROR,
+    ):
+        """
+        Args:
+            exact_counter: Returns exact token counts for a list of texts
+            sample_every: Batches between exact samples (0 disables sampling)
+            max_samples: Sampled texts kept for error tracking and refitting
+            max_error: Mean relative error that triggers a refit
+        """
+        self.exact_counter = exact_counter
+        self.sample_every = sample_every
+        self.max_error = max_error
+        self.rates = _DEFAULT_RATES.copy()
+        self._lock = threading.Lock()
+        self._batches = 0
+        # Each sample is (script counts of the text, exact token count)
+        self._samples: Deque[Tuple[np.ndarray, int]] = deque(
+            maxlen=max_samples
+        )
+
+    def estimate(self, texts: List[str]) -> List[int]:
+        """
+        Estimate token counts for several texts.
+
+        Args:
+            texts: The texts to count tokens for
+
+        Returns:
+            list: Estimated number of tokens in each text, in the same order
+        """
+        counts = script_counts(texts)
+        estimates = np.rint(counts @ self.rates).astype(int)
+        # Any non-empty text is at least one token
+        estimates = np.where(
+            counts.sum(axis=1) > 0, np.maximum(estimates, 1), 0
+        )
+
+        with self._lock:
+            self._batches += 1
+            sample = (
+                self.sample_every > 0
+                and (self._batches - 1) % self.sample_every == 0
+            )
+        if sample:
+            self._record_sample(texts, counts)
+        return [int(estimate) for estimate in estimates]
+
+    def _record_sample(self, texts: List[str], counts: np.ndarray) -> None:
+        try:
+            exact = self.exact_counter(texts)
+        except Exception as e:
+            print(f"Token estimate sampling error: {e}")
+            return
+        with self._lock:
+            for row, tokens in zip(counts, exact):
+                if tokens > 0:
+                    self._samples.append((row, tokens))
+            error = self._mean_error()
+            if error is not None and error > self.max_error:
+                self._refit()
+
+    def _errors(self) -> np.ndarray:
+        counts = np.array([row for row, _ in self._samples])
+        exact = np.array([tokens for _, tokens in self._samples], dtype=float)
+        return np.abs(counts @ self.rates - exact) / exact
+
+    def _mean_error(self) -> Optional[float]:
+        if not self._samples:
+            return None
+        return float(self._errors().mean())
+
+    def _refit(self) -> None:
+        counts = np.array([row for row, _ in self._samples])
+        exact = np.array([tokens for _, tokens in self._samples], dtype=float)
+        # Relative error matters, so weight every text by 1 / exact count
+        weights = 1 / exact
+        fitted, *_ = np.linalg.lstsq(
+            counts * weights[:, None], exact * weights, rcond=None
+        )
+        # Scripts missing from the samples keep their previous rate
+        seen = counts.sum(axis=0) > 0
+        self.rates = np.where(seen & (fitted > 0), fitted, self.rates)
+        print(f"Token estimator refitted on {len(exact)} samples")
+
+    def error_stats(self) -> Dict[str, Any]:
+        """
+        Get the estimator error measured on the sampled texts.
+
+        Returns:
+            dict: Number of samples and the mean and maximum relative error
+            (None until a sample was taken)
+        """
+        with self._lock:
+            if not self._samples:
+                return {"samples": 0, "mean_error": None, "max_error": None}
+            errors = self._errors()
+            return {
+                "samples": len(errors),
+                "mean_error": float(errors.mean()),
+                "max_error": float(errors.max()),
+            }
@@ -0,0 +1,205 @@
+"""
+Module providing lightweight latency spans that nest per question.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Directory where every question's trace is written (empty disables it) and
+# the file format: "chrome" (chrome://tracing, Perfetto) or "json".
+TRACE_DIR = os.getenv("TRACE_DIR", "")
+TRACE_FORMAT = os.getenv("TRACE_FORMAT", "chrome")
+
+T = TypeVar("T")
+
+
+class Span:
+    """
+    A named, timed section of work with attributes and child spans.
+
+    Spans opened while another span is current become its children, also on
+    worker threads that were started from it (see src/concurrency.py).
+    """
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.thread = threading.current_thread().name
+        self.children: List["Span"] = []
+
+    def set(self, **attrs: Any) -> None:
+        """Add or replace attributes of the span."""
+        self.attrs.update(attrs)
+
+    @property
+    def duration(self) -> float:
+        """Seconds the span took, or has taken so far if still open."""
+        end = self.end if self.end is not None else time.perf_counter()
+        return end - self.start
+
+    def walk(self) -> Iterator["Span"]:
+        """Iterate over this span and all of its descendants."""
+        yield self
+        for child in list(self.children):
+            yield from child.walk()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the span tree to plain data.
+
+        Returns:
+            dict: Name, start time (Unix seconds), duration in seconds,
+            thread name, attributes and children
+        """
+        return {
+            "name": self.name,
+            "start": self.started_at,
+            "duration": self.duration,
+            "thread": self.thread,
+            "attrs": self.attrs,
+            "children": [child.to_dict() for child in list(self.children)],
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar(
+    "current_span", default=None
+)
+
+
+def current_span() -> Optional[Span]:
+    """
+    Get the innermost open span of the current context.
+
+    Returns:
+        Span or None if no span is open
+    """
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Span]:
+    """
+    Time a block of work as a child of the current span.
+
+    Exceptions are recorded in the "error" attribute and re-raised.
+
+    Args:
+        name: Name of the span
+        **attrs: Attributes to attach, such as the URL being fetched
+
+    Yields:
+        Span: The open span, for adding attributes
+    """
+    parent = _current_span.get()
+    new_span = Span(name, attrs)
+    if parent is not None:
+        parent.children.append(new_span)
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.attrs["error"] = repr(e)
+        raise
+    finally:
+        new_span.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+def traced_call(
+    name: str, func: Callable[..., T], *args: Any, **attrs: Any
+) -> Callable[[], T]:
+    """
+    Bind a call so that it runs inside a span, e.g. on a worker thread.
+
+    Args:
+        name: Name of the span
+        func: The function to call
+        *args: Positional arguments for func
+        **attrs: Attributes to attach to the span
+
+    Returns:
+        callable: A function without arguments that makes the call
+    """
+    def call() -> T:
+        with span(name, **attrs):
+            return func(*args)
+
+    return call
+
+
+def to_chrome_trace(root: Span) -> Dict[str, Any]:
+    """
+    Convert a span tree to the Chrome trace event format.
+
+    Every span becomes a complete ("X") event on the row of the thread that
+    ran it, with timestamps in microseconds from the start of the root span.
+
+    Args:
+        root: The root span
+
+    Returns:
+        dict: Trace with a "traceEvents" list, loadable in chrome://tracing
+        or Perfetto
+    """
+    thread_ids: Dict[str, int] = {}
+    events: List[Dict[str, Any]] = []
+    for item in root.walk():
+        tid = thread_ids.setdefault(item.thread, len(thread_ids) + 1)
+        events.append(
+            {
+                "name": item.name,
+                "ph": "X",
+                "ts": (item.start - root.start) * 1e6,
+                "dur": item.duration * 1e6,
+                "pid": 1,
+                "tid": tid,
+                "args": {k: str(v) for k, v in item.attrs.items()},
+            }
+        )
+    for thread, tid in thread_ids.items():
+        events.append(
+            {
+                "name": "thread_name", "ph": "M", "pid": 1, "tid": tid,
+                "args": {"name": thread},
+            }
+        )
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def export_trace(
+    root: Span, path: str, trace_format: str = TRACE_FORMAT
+) -> None:
+    """
+    Write a span tree to a file.
+
+    Args:
+        root: The root span
+        path: The file to write
+        trace_format: "chrome" for the Chrome trace event format or "json"
+            for the nested span tree
+    """
+    if trace_format == "chrome":
+        data = to_chrome_trace(root)
+    elif trace_format == "json":
+        data = root.to_dict()
+    else:
+        raise ValueError(
+            f"Unknown trace format '{trace_format}'. Choose chrome or json."
+        )
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, default=str)
@@ -0,0 +1,49 @@
+"""Shared pytest fixtures."""
+
+import pytest
+from src import answer_cache, domain_health, page_cache, search_cache
+from src.answer_cache import AnswerCache
+from src.domain_health import DomainHealth
+from src.llm_clients import reset_models
+from src.page_cache import PageCache
+from src.search_cache import SearchCache
+
+
+@pytest.fixture(autouse=True)
+def isolated_page_cache(tmp_path, monkeypatch):
+    """Give every test its own empty persistent page cache."""
+    cache = PageCache(str(tmp_path / "pages.sqlite3"))
+    monkeypatch.setattr(page_cache, "_page_cache", cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_answer_cache(monkeypatch):
+    """Give every test its own empty answer cache."""
+    cache = AnswerCache()
+    monkeypatch.setattr(answer_cache, "_answer_cache", cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_search_cache(monkeypatch):
+    """Give every test its own empty search cache."""
+    cache = SearchCache()
+    monkeypatch.setattr(search_cache, "_search_cache", cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_domain_health(monkeypatch):
+    """Give every test its own domain health registry."""
+    health = DomainHealth()
+    monkeypatch.setattr(domain_health, "_domain_health", health)
+    return health
+
+
+@pytest.fixture(autouse=True)
+def fresh_model_clients():
+    """Make every test create its own (possibly mocked) model handles."""
+    reset_models()
+    yield
+    reset_models()
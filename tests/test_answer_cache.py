@@ -0,0 +1,103 @@
+"""Test src/answer_cache.py."""
+
+from unittest.mock import patch
+from src.answer_cache import AnswerCache, normalize_question
+
+RESULT = {"answer": "Meditation reduces stress [1].", "sources": []}
+
+
+def test_normalize_question():
+    """Test that case, punctuation and articles are ignored."""
+    assert normalize_question("What is  the benefit of Meditation?") == (
+        "what is benefit of meditation"
+    )
+    assert normalize_question("what is meditation") == normalize_question(
+        "What is meditation?"
+    )
+
+
+def test_cache_exact_and_near_duplicate_hits():
+    """Test that rewordings hit and different questions miss."""
+    cache = AnswerCache(similarity=0.6)
+    cache.put("What are the benefits of meditation?", RESULT)
+
+    exact = cache.get("what are benefits of meditation")
+    assert exact is not None and exact.similarity == 1.0
+    assert exact.result == RESULT
+
+    near = cache.get("What are the benefits of meditation, and why?")
+    assert near is not None and 0.6 <= near.similarity < 1.0
+    assert near.question == "What are the benefits of meditation?"
+
+    assert cache.get("What are the risks of skydiving?") is None
+
+
+def test_cache_does_not_match_other_numbers():
+    """Test that questions differing in a number are not near-duplicates."""
+    cache = AnswerCache()
+    cache.put("Population of Kenya in 2020", RESULT)
+    assert cache.get("Population of Kenya in 2023") is None
+
+
+LONG_QUESTION = (
+    "What were the main causes and long term economic consequences of the "
+    "financial crisis that hit {} in {}"
+)
+
+
+def test_cache_does_not_match_long_questions_with_another_year():
+    """Test that a changed year is not hidden by a long shared wording."""
+    cache = AnswerCache(similarity=0.5)
+    cache.put(LONG_QUESTION.format("Argentina", "2001"), RESULT)
+    assert cache.get(LONG_QUESTION.format("Argentina", "2018")) is None
+
+
+def test_cache_does_not_match_long_questions_with_another_entity():
+    """Test that a changed name is not hidden by a long shared wording."""
+    cache = AnswerCache(similarity=0.5)
+    cache.put(LONG_QUESTION.format("Argentina", "2001"), RESULT)
+    assert cache.get(LONG_QUESTION.format("Greece", "2001")) is None
+    assert cache.get(
+        "What were the main causes and the long term economic consequences "
+        "of the financial crisis that hit Argentina in 2001?"
+    ) is not None
+
+
+def test_cache_returns_copies():
+    """Test that callers cannot modify the stored result."""
+    cache = AnswerCache()
+    cache.put("What is meditation?", RESULT)
+    cache.get("What is meditation?").result["answer"] = "Changed"
+    assert cache.get("What is meditation?").result == RESULT
+
+
+def test_cache_ttl_and_lru_eviction():
+    """Test that entries expire and the least recently used is evicted."""
+    cache = AnswerCache(ttl=10, max_entries=2)
+    with patch("src.answer_cache.time.time", return_value=1000.0):
+        cache.put("first question", RESULT)
+        cache.put("second question", RESULT)
+        cache.get("first question")
+        cache.put("third question", RESULT)
+        assert cache.get("second question") is None
+        assert cache.get("first question") is not None
+    with patch("src.answer_cache.time.time", return_value=1010.0):
+        assert cache.get("first question") is None
+        assert len(cache) == 0
+
+
+def test_cache_update_adds_fields():
+    """Test that validation results can be added after storing."""
+    cache = AnswerCache()
+    cache.put("What is meditation?", RESULT)
+    cache.update("what is meditation", quality_results={"overall_score": "x"})
+    stored = cache.get("What is meditation?").result
+    assert stored["quality_results"] == {"overall_score": "x"}
+
+
+def test_cache_scopes_are_separate():
+    """Test that answers for one search region are not reused in another."""
+    cache = AnswerCache()
+    cache.put("What is meditation?", RESULT, scope="ke")
+    assert cache.get("What is meditation?", "us") is None
+    assert cache.get("what is meditation", "ke") is not None
@@ -0,0 +1,52 @@
+"""Test src/citation_score.py."""
+
+from src.citation_score import rate, score_citations
+
+
+def sentence(citations, valid_nums):
+    """Build a validate_citations entry for one sentence."""
+    details = [
+        {"citation_num": num, "valid": num in valid_nums, "reason": ""}
+        for num in citations
+    ]
+    return {
+        "sentence": "",
+        "citations": citations,
+        "validation": "Valid" if valid_nums else "Invalid",
+        "details": details,
+    }
+
+
+def test_rate_thresholds():
+    """Test the rating labels at their thresholds."""
+    assert rate(9, 10).startswith("Excellent")
+    assert rate(3, 4) == "Good (3/4 valid citations, 75.0%)"
+    assert rate(1, 2).startswith("Fair")
+    assert rate(0, 3).startswith("Poor")
+
+
+def test_score_citations_sentences_and_unique_citations():
+    """Test that both scores come from one pass over the results."""
+    scores = score_citations(
+        [
+            sentence([1, 2], {1}),
+            sentence([1], set()),
+            sentence([3], set()),
+            sentence([], set()),
+        ]
+    )
+    assert scores["valid_sentences"] == 1
+    assert scores["total_sentences"] == 4
+    assert scores["overall_score"].startswith("Poor (1/4")
+    # [1] is supported once, [2] and [3] never
+    assert scores["valid_citations"] == 1
+    assert scores["total_citations"] == 3
+    assert scores["citation_score"].startswith("Poor (1/3")
+
+
+def test_score_citations_empty():
+    """Test the scores when the answer has no sentences or citations."""
+    scores = score_citations([sentence([], set())])
+    assert scores["overall_score"].startswith("Poor")
+    assert scores["citation_score"] == "No citations to evaluate"
+    assert score_citations([])["overall_score"] == "N/A (No citations found)"
@@ -0,0 +1,102 @@
+"""Test src/domain_health.py."""
+
+import threading
+from email.utils import formatdate
+from unittest.mock import patch
+
+import pytest
+
+from src.domain_health import DomainHealth, domain_of, parse_retry_after
+
+
+def test_domain_of():
+    """Test that hosts are lowercased and www. is dropped."""
+    assert domain_of("https://WWW.Example.com:8080/page") == "example.com"
+    assert domain_of("http://news.example.com") == "news.example.com"
+
+
+def test_parse_retry_after():
+    """Test both Retry-After formats and malformed values."""
+    assert parse_retry_after("30") == 30.0
+    later = parse_retry_after(formatdate(2_000_000_000, usegmt=True))
+    assert later is not None and later > 0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_circuit_opens_after_consecutive_failures():
+    """Test the open, cool-down, trial and close cycle."""
+    health = DomainHealth(failures=2, cooldown=60)
+    with patch("src.domain_health.time.time", return_value=1000.0):
+        health.record_failure("bad.com")
+        assert health.allow("bad.com")
+        health.record_failure("bad.com")
+        assert not health.allow("bad.com")
+        assert health.snapshot("bad.com")["failure_rate"] == 1.0
+    with patch("src.domain_health.time.time", return_value=1061.0):
+        assert health.allow("bad.com")  # Trial after the cool-down
+        health.record_failure("bad.com")
+        assert not health.allow("bad.com")
+    with patch("src.domain_health.time.time", return_value=1122.0):
+        health.record_success("bad.com", 0.5)
+        health.record_failure("bad.com")
+        assert health.allow("bad.com")  # Closed again after the success
+
+
+def test_retry_after_opens_circuit_at_once():
+    """Test that a 429 with Retry-After blocks the domain until then."""
+    health = DomainHealth(failures=5, cooldown=60)
+    with patch("src.domain_health.time.time", return_value=1000.0):
+        health.record_failure("busy.com", retry_after=10)
+        assert not health.allow("busy.com")
+    with patch("src.domain_health.time.time", return_value=1010.0):
+        assert health.allow("busy.com")
+
+
+def test_snapshot_tracks_rejections_and_latency():
+    """Test the per-domain statistics."""
+    health = DomainHealth()
+    health.record_success("ok.com", 1.0)
+    health.record_success("ok.com", 2.0)
+    health.record_rejection("ok.com")
+    snapshot = health.snapshot("ok.com")
+    assert snapshot["requests"] == 3
+    assert snapshot["rejections"] == 1
+    assert snapshot["failure_rate"] == 0.0
+    assert snapshot["latency"] == pytest.approx(1.2)
+    assert not snapshot["circuit_open"]
+
+
+def test_half_open_circuit_lets_one_trial_through():
+    """Test that concurrent callers get a single trial after the cool-down."""
+    health = DomainHealth(failures=1, cooldown=60)
+    with patch("src.domain_health.time.time", return_value=1000.0):
+        health.record_failure("bad.com")
+    barrier = threading.Barrier(8)
+    allowed = []
+
+    def request():
+        barrier.wait()
+        allowed.append(health.allow("bad.com"))
+
+    with patch("src.domain_health.time.time", return_value=1061.0):
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert allowed.count(True) == 1
+        health.record_success("bad.com", 0.5)
+        assert health.allow("bad.com") and health.allow("bad.com")
+
+
+def test_unrecorded_trial_expires():
+    """Test that a trial that never reports does not block the domain."""
+    health = DomainHealth(failures=1, cooldown=60)
+    with patch("src.domain_health.time.time", return_value=1000.0):
+        health.record_failure("bad.com")
+    with patch("src.domain_health.time.time", return_value=1061.0):
+        assert health.allow("bad.com")
+        assert not health.allow("bad.com")
+    with patch("src.domain_health.time.time", return_value=1122.0):
+        assert health.allow("bad.com")
@@ -0,0 +1,86 @@
+"""Test src/extract.py."""
+
+import pytest
+from src.extract import (
+    extract_bs4,
+    extract_chunks,
+    extract_stream,
+    extract_text,
+)
+
+CORPUS = [
+    # Content container with boilerplate around it
+    """
+    <html><body>
+        <header>Header content</header>
+        <nav>Navigation</nav>
+        <article class="content">
+            <p>This is the main content.</p>
+            <p>Another paragraph &amp; more &#8211; text.</p>
+            <aside>Related links</aside>
+        </article>
+        <script>var x = 1;</script>
+        <footer>Footer content</footer>
+    </body></html>
+    """,
+    # Nested content containers are each counted, like find_all does
+    """
+    <div class="post"><div class="entry-text">Inner text</div>Outer</div>
+    """,
+    # No content containers: long paragraphs only
+    """
+    <html><body>
+        <p>Short one.</p>
+        <p>This paragraph is long enough to be kept by the <b>fallback</b>.</p>
+        <p>Another paragraph that is easily longer than forty characters.</p>
+    </body></html>
+    """,
+    # Nothing but short text: whole-page fallback
+    """
+    <html><body><span>Just</span> <em>a few</em><br>words<!-- hidden --></body>
+    </html>
+    """,
+    # Unclosed tags, stray end tags and template/ruby text
+    """
+    <div class="content"><p>Unclosed <b>bold<ruby>kanji<rt>yomi</rt></ruby>
+    </i><template>hidden</template><br/>after</div>
+    """,
+]
+
+
+@pytest.mark.parametrize("html", CORPUS)
+def test_stream_matches_bs4(html):
+    """Test that the streaming extractor reproduces the BeautifulSoup text."""
+    assert extract_stream(html) == extract_bs4(html)
+
+
+def test_extract_text_removes_boilerplate():
+    """Test that skipped tags are removed from the main content."""
+    text = extract_text(CORPUS[0], backend="stream")
+    assert "This is the main content." in text
+    assert "& more – text." in text
+    assert "Header content" not in text
+    assert "Related links" not in text
+    assert "var x" not in text
+
+
+def test_extract_text_unknown_backend():
+    """Test that an unknown backend name is rejected."""
+    with pytest.raises(ValueError, match="Unknown extractor"):
+        extract_text("<p>text</p>", backend="missing")
+
+
+def test_extract_chunks_stops_early():
+    """Test that streaming stops once the kept prefix is settled."""
+    html = "<div class='content'>" + "<p>Some article text.</p>" * 5000
+    chunks = [html[i:i + 1000] for i in range(0, len(html), 1000)]
+    consumed = []
+
+    def feed():
+        for chunk in chunks:
+            consumed.append(chunk)
+            yield chunk
+
+    text = extract_chunks(feed(), max_chars=500)
+    assert text[:500] == extract_bs4(html)[:500]
+    assert len(consumed) < len(chunks) // 10
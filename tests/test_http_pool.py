@@ -0,0 +1,60 @@
+"""Test src/http_pool.py."""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from src.http_pool import get_session, get_pool_stats, reset_pool_stats
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    """Fixture for a keep-alive HTTP server on a random local port."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_session_per_thread():
+    """Test that sessions are reused per thread and share one adapter."""
+    session = get_session()
+    assert get_session() is session
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(get_session()))
+    thread.start()
+    thread.join()
+
+    assert other[0] is not session
+    assert other[0].get_adapter("https://x") is session.get_adapter(
+        "https://x"
+    )
+
+
+def test_pool_stats_connection_reuse(local_server):
+    """Test that repeated requests to one host reuse the connection."""
+    reset_pool_stats()
+    for _ in range(3):
+        response = get_session().get(local_server, timeout=5)
+        assert response.text == "ok"
+
+    stats = get_pool_stats()
+    assert stats == {"hits": 2, "misses": 1, "requests": 3}
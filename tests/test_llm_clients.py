@@ -0,0 +1,93 @@
+"""Test src/llm_clients.py."""
+
+import contextvars
+import threading
+
+import pytest
+from unittest.mock import patch
+from src import llm_clients
+from src.llm_clients import get_model, get_setup_times, track_setup_times
+
+
+@patch("src.llm_clients.genai.configure")
+@patch("src.llm_clients.genai.GenerativeModel")
+def test_get_model_reuses_handles(mock_model, mock_configure, monkeypatch):
+    """Test that the client is configured once and handles are reused."""
+    monkeypatch.setenv("GEMINI_API_KEY", "test_key")
+
+    first = get_model("answer")
+    second = get_model("answer")
+
+    assert first is second
+    mock_configure.assert_called_once_with(api_key="test_key")
+    mock_model.assert_called_once_with(llm_clients.GEMINI_MODELS["answer"])
+    assert set(get_setup_times()) == {"answer"}
+
+
+@patch("src.llm_clients.genai.configure")
+@patch("src.llm_clients.genai.GenerativeModel")
+def test_get_model_per_task(mock_model, mock_configure, monkeypatch):
+    """Test that each task gets a handle for its own model."""
+    monkeypatch.setenv("GEMINI_API_KEY", "test_key")
+    monkeypatch.setitem(
+        llm_clients.GEMINI_MODELS, "validation", "gemini-1.5-flash-8b"
+    )
+
+    get_model("answer")
+    get_model("validation")
+
+    assert mock_model.call_count == 2
+    assert mock_model.call_args[0][0] == "gemini-1.5-flash-8b"
+    mock_configure.assert_called_once()
+
+
+@patch("src.llm_clients.genai.configure")
+@patch("src.llm_clients.genai.GenerativeModel")
+def test_get_model_reconfigures_on_key_change(
+    mock_model, mock_configure, monkeypatch
+):
+    """Test that a new API key configures a new client."""
+    monkeypatch.setenv("GEMINI_API_KEY", "key_1")
+    get_model("answer")
+    monkeypatch.setenv("GEMINI_API_KEY", "key_2")
+    get_model("answer")
+
+    assert mock_configure.call_count == 2
+    assert mock_model.call_count == 2
+
+
+def test_get_model_missing_key(monkeypatch):
+    """Test that a missing API key is reported."""
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    with pytest.raises(ValueError, match="GEMINI_API_KEY not set"):
+        get_model("answer")
+
+
+@patch("src.llm_clients.genai.configure")
+@patch("src.llm_clients.genai.GenerativeModel")
+def test_setup_time_is_charged_to_the_paying_request(
+    mock_model, mock_configure, monkeypatch
+):
+    """Test that each request only sees the setup it paid for."""
+    monkeypatch.setenv("GEMINI_API_KEY", "test_key")
+    first = track_setup_times()
+    get_model("answer")
+    assert set(first) == {"answer"}
+
+    # A concurrent request in its own context pays for the validation model
+    other = {}
+
+    def other_request():
+        other.update(times=track_setup_times())
+        get_model("validation")
+        get_model("answer")  # Already warm, so free
+
+    thread = threading.Thread(
+        target=contextvars.copy_context().run, args=(other_request,)
+    )
+    thread.start()
+    thread.join()
+
+    assert set(other["times"]) == {"validation"}
+    assert set(first) == {"answer"}
+    assert set(get_setup_times()) == {"answer", "validation"}
@@ -0,0 +1,39 @@
+"""Test src/local_verify.py."""
+
+from src.local_verify import LocalVerifier
+
+SOURCE = (
+    "A 2019 trial found that regular meditation lowers cortisol by 20% in "
+    "adults. Participants meditated for ten minutes a day."
+)
+
+
+def test_verify_supports_near_verbatim_sentence():
+    """Test that a sentence copied from the source is supported."""
+    verifier = LocalVerifier({"a": SOURCE})
+    verdict = verifier.verify(
+        "Regular meditation lowers cortisol by 20% in adults [1].", "a"
+    )
+    assert verdict is not None and verdict[0] is True
+
+
+def test_verify_rejects_unrelated_sentence():
+    """Test that a sentence sharing no key words with the source fails."""
+    verifier = LocalVerifier({"a": SOURCE})
+    verdict = verifier.verify("Cats sleep sixteen hours daily [1].", "a")
+    assert verdict is not None and verdict[0] is False
+
+
+def test_verify_defers_changed_numbers_to_llm():
+    """Test that a copied sentence with a different number is not accepted."""
+    verifier = LocalVerifier({"a": SOURCE})
+    assert verifier.verify(
+        "Regular meditation lowers cortisol by 50% in adults.", "a"
+    ) is None
+
+
+def test_verify_defers_paraphrases_and_missing_sources():
+    """Test that paraphrases and empty sources are left to the LLM."""
+    verifier = LocalVerifier({"a": SOURCE, "b": ""})
+    assert verifier.verify("Meditating reduces cortisol levels.", "a") is None
+    assert verifier.verify("Meditation lowers cortisol.", "b") is None
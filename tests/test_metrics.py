@@ -0,0 +1,94 @@
+"""Test src/metrics.py."""
+
+import random
+
+from src.metrics import (
+    Histogram,
+    MetricsRegistry,
+    RollingHistogram,
+    observe_spans,
+)
+from src.tracing import span
+
+
+def test_histogram_quantiles_within_precision():
+    """Test that quantiles stay within the bucket precision."""
+    rng = random.Random(0)
+    values = [rng.lognormvariate(0, 1.5) for _ in range(10000)]
+    histogram = Histogram(sub_buckets=32)
+    for value in values:
+        histogram.record(value)
+
+    ordered = sorted(values)
+    for q in (0.5, 0.95, 0.99):
+        exact = ordered[int(q * len(ordered)) - 1]
+        assert abs(histogram.quantile(q) - exact) / exact < 0.03
+    assert histogram.count == len(values)
+    assert Histogram().quantile(0.5) is None
+
+
+def test_rolling_histogram_drops_old_intervals():
+    """Test that values older than the window leave the percentiles."""
+    rolling = RollingHistogram(window=60, intervals=6)
+    rolling.record(100.0, now=1000)
+    rolling.record(1.0, now=1075)
+
+    window = rolling.window(now=1075)
+    assert window.count == 1
+    assert window.quantile(0.99) == 1.0
+    assert rolling.total.count == 2
+
+
+def test_render_prometheus():
+    """Test the Prometheus text format of counters and summaries."""
+    registry = MetricsRegistry()
+    registry.inc("scrape_pages_total", help_text="Pages", result="ok")
+    registry.inc("scrape_pages_total", result="ok")
+    registry.inc("scrape_pages_total", result="error")
+    for value in (0.1, 0.2, 0.3):
+        registry.observe("stage_latency_seconds", value, stage="search")
+
+    text = registry.render_prometheus()
+    assert "# HELP scrape_pages_total Pages" in text
+    assert "# TYPE scrape_pages_total counter" in text
+    assert 'scrape_pages_total{result="ok"} 2' in text
+    assert 'scrape_pages_total{result="error"} 1' in text
+    assert "# TYPE stage_latency_seconds summary" in text
+    assert 'stage_latency_seconds{stage="search",quantile="0.5"}' in text
+    assert 'stage_latency_seconds_count{stage="search"} 3' in text
+    assert registry.counter_value("scrape_pages_total", result="ok") == 2
+
+
+def test_quantiles_and_file_export(tmp_path):
+    """Test quantile lookup and the file exporter."""
+    registry = MetricsRegistry()
+    for value in range(1, 101):
+        registry.observe("question_latency_seconds", float(value))
+
+    quantiles = registry.quantiles("question_latency_seconds")
+    assert quantiles["count"] == 100
+    assert abs(quantiles["p50"] - 50) / 50 < 0.03
+    assert abs(quantiles["p99"] - 99) / 99 < 0.03
+    assert registry.quantiles("missing")["p50"] is None
+
+    path = tmp_path / "metrics" / "ask.prom"
+    registry.write(str(path))
+    assert "question_latency_seconds_count 100" in path.read_text()
+
+
+def test_observe_spans_labels_by_path(monkeypatch):
+    """Test that span durations are recorded under their path."""
+    registry = MetricsRegistry()
+    monkeypatch.setattr("src.metrics._registry", registry)
+    with span("question") as root:
+        with span("scrape"):
+            with span("request"):
+                pass
+
+    observe_spans(root)
+    assert registry.quantiles("stage_latency_seconds", stage="scrape")[
+        "count"
+    ] == 1
+    assert registry.quantiles(
+        "stage_latency_seconds", stage="scrape/request"
+    )["count"] == 1
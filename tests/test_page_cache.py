@@ -0,0 +1,100 @@
+"""Test src/page_cache.py."""
+
+import secrets
+import time
+import responses
+from src.page_cache import PageCache, normalize_url
+from src.scrape import scrape_page
+
+
+def test_normalize_url():
+    """Test that equivalent URLs normalize to the same key."""
+    assert normalize_url("HTTP://Example.com:80/a?b=2&a=1#top") == (
+        "http://example.com/a?a=1&b=2"
+    )
+    assert normalize_url("https://example.com?utm_source=x") == (
+        "https://example.com/"
+    )
+
+
+def test_page_cache_roundtrip(tmp_path):
+    """Test storing and reading back a page."""
+    cache = PageCache(str(tmp_path / "cache.db"))
+    cache.put("http://example.com", "Some text", '"abc"', None)
+
+    cached = cache.get("http://EXAMPLE.com/")
+    assert cached is not None
+    assert cached.text == "Some text"
+    assert cached.etag == '"abc"'
+    assert cached.fresh is True
+    assert cache.get("http://example.com/other") is None
+
+
+def test_page_cache_ttl(tmp_path):
+    """Test that entries past the TTL are stale and purged."""
+    cache = PageCache(str(tmp_path / "cache.db"), ttl=0)
+    cache.put("http://example.com", "Some text")
+
+    assert cache.get("http://example.com").fresh is False
+    assert cache.purge_expired() == 1
+    assert cache.get("http://example.com") is None
+
+
+def test_page_cache_lru_eviction(tmp_path):
+    """Test that least recently used entries are evicted over the limit."""
+    cache = PageCache(str(tmp_path / "cache.db"), max_bytes=1500)
+    # Random hex compresses to roughly 550 bytes, so only two entries fit
+    cache.put("http://example.com/1", secrets.token_hex(500))
+    cache.put("http://example.com/2", secrets.token_hex(500))
+    cache.get("http://example.com/1")
+    cache.put("http://example.com/3", secrets.token_hex(500))
+
+    assert cache.get("http://example.com/2") is None
+    assert cache.get("http://example.com/1") is not None
+    assert cache.get("http://example.com/3") is not None
+    assert cache.total_bytes() <= 1500
+
+
+@responses.activate
+def test_scrape_page_revalidates_stale_entry(isolated_page_cache):
+    """Test that a stale entry is revalidated with a conditional request."""
+    url = "http://example.com/cached"
+    isolated_page_cache.ttl = 0
+    isolated_page_cache.put(url, "Cached text", '"v1"', None)
+    responses.add(responses.GET, url, status=304)
+
+    assert scrape_page(url) == "Cached text"
+    assert responses.calls[0].request.headers["If-None-Match"] == '"v1"'
+
+
+@responses.activate
+def test_scrape_page_serves_fresh_entry(isolated_page_cache):
+    """Test that a fresh entry is served without any request."""
+    url = "http://example.com/fresh"
+    isolated_page_cache.put(url, "Fresh text")
+
+    assert scrape_page(url) == "Fresh text"
+    assert len(responses.calls) == 0
+
+
+@responses.activate
+def test_scrape_page_revalidates_within_process(isolated_page_cache):
+    """Test that a page scraped earlier is refetched once it is stale."""
+    url = "http://example.com/changing"
+    isolated_page_cache.ttl = 0.2
+    for version in ("v1", "v2"):
+        responses.add(
+            responses.GET,
+            url,
+            body=f"<html><body><p>Page text {version}.</p></body></html>",
+            headers={"Content-Type": "text/html", "ETag": f'"{version}"'},
+        )
+
+    assert "v1" in scrape_page(url)
+    assert "v1" in scrape_page(url)  # Fresh: served without a request
+    assert len(responses.calls) == 1
+    time.sleep(0.3)
+
+    assert "v2" in scrape_page(url)
+    assert len(responses.calls) == 2
+    assert responses.calls[1].request.headers["If-None-Match"] == '"v1"'
@@ -0,0 +1,282 @@
+"""Test src/pipeline.py."""
+
+import threading
+import time
+from unittest.mock import patch
+from src.pipeline import QuestionPipeline
+from src.scrape import RetryLater
+
+SEARCH_RESULTS = [
+    {"title": f"Source {i}", "url": f"http://example.com/{i}"}
+    for i in range(1, 5)
+]
+
+
+def fake_scrape(url, _cancel=None, _defer_retries=False):
+    """Scrape stub where the last source is slow and the third is empty."""
+    if url.endswith("/4"):
+        time.sleep(1.0)
+    if url.endswith("/3"):
+        return ""
+    return f"Content of {url}"
+
+
+@patch("src.pipeline.validate_citations")
+@patch("src.pipeline.generate_answer")
+@patch("src.pipeline.scrape_page", side_effect=fake_scrape)
+@patch("src.pipeline.search_web", return_value=SEARCH_RESULTS)
+def test_pipeline_starts_with_fastest_sources(
+    mock_search, mock_scrape, mock_generate, mock_validate
+):
+    """Test that generation starts once the fastest usable pages are ready."""
+    mock_generate.return_value = ("Answer [1].", "Sources:\n[1] Source 1")
+    mock_validate.return_value = {"overall_score": "Excellent", "citations": []}
+    progress = []
+
+    pipeline = QuestionPipeline(
+        min_sources=2, on_progress=lambda pct, text: progress.append(pct)
+    )
+    start = time.time()
+    result = pipeline.run_sync("What is meditation?")
+
+    assert time.time() - start < 0.8  # Did not wait for the slow page
+    assert [s["url"] for s in result["sources"]] == [
+        "http://example.com/1",
+        "http://example.com/2",
+    ]
+    question, sources, scraped = mock_generate.call_args[0]
+    assert sources == result["sources"]
+    assert scraped is result["scraped_texts"]
+    assert result["answer"] == "Answer [1]."
+    quality = result["quality_results"].result(timeout=5)
+    assert quality["overall_score"] == "Excellent"
+    telemetry = result["telemetry"].result(timeout=5)
+    assert telemetry["latency"] == result["latency"]
+    assert progress == [10, 30, 50, 100]
+
+    stages = [child.name for child in result["trace"].children]
+    assert stages[:2] == ["answer_cache", "search"]
+    assert stages.count("scrape") == 4
+    assert stages[-1] == "generate"
+
+
+@patch("src.pipeline.generate_answer")
+@patch("src.pipeline.search_web", return_value=[])
+def test_pipeline_no_search_results(mock_search, mock_generate):
+    """Test that an empty search ends the pipeline early."""
+    result = QuestionPipeline().run_sync("What is meditation?")
+    assert result["search_results"] == []
+    assert result["answer"] is None
+    mock_generate.assert_not_called()
+
+
+@patch("src.pipeline.validate_citations")
+@patch("src.pipeline.stream_answer")
+@patch("src.pipeline.scrape_page", return_value="Some content")
+@patch("src.pipeline.search_web", return_value=SEARCH_RESULTS[:1])
+def test_pipeline_streams_answer(
+    mock_search, mock_scrape, mock_stream, mock_validate
+):
+    """Test that partial answers are reported while the answer streams."""
+    mock_stream.return_value = iter(
+        ["Meditation [", "1] helps.", "\n\nSources:\n[1] Source 1 - url"]
+    )
+    mock_validate.return_value = {"overall_score": "Excellent", "citations": []}
+    partials = []
+
+    pipeline = QuestionPipeline(on_answer_chunk=partials.append)
+    result = pipeline.run_sync("What is meditation?")
+
+    assert partials == [
+        "Meditation [",
+        "Meditation [1] helps.",
+        "Meditation [1] helps.",
+    ]
+    assert result["answer"] == "Meditation [1] helps."
+    assert result["sources_md"] == "Sources:[1] Source 1 - url"
+    telemetry = result["telemetry"].result(timeout=5)
+    ttft = telemetry["time_to_first_token"]
+    assert 0 <= ttft <= telemetry["latency"]
+
+
+def slow_validate(answer, sources, scraped_texts):
+    """Validation stub that takes longer than the rest of the pipeline."""
+    time.sleep(0.5)
+    return {"overall_score": "Good", "citations": []}
+
+
+@patch("src.pipeline.validate_citations", side_effect=slow_validate)
+@patch("src.pipeline.generate_answer", return_value=("Answer [1].", None))
+@patch("src.pipeline.scrape_page", return_value="Some content")
+@patch("src.pipeline.search_web", return_value=SEARCH_RESULTS[:1])
+def test_pipeline_validates_in_background(
+    mock_search, mock_scrape, mock_generate, mock_validate
+):
+    """Test that the answer is returned before validation finishes."""
+    start = time.time()
+    result = QuestionPipeline().run_sync("What is meditation?")
+
+    assert time.time() - start < 0.4
+    assert not result["quality_results"].done()
+    quality = result["quality_results"].result(timeout=5)
+    assert quality["overall_score"] == "Good"
+
+
+@patch("src.pipeline.validate_citations")
+@patch("src.pipeline.generate_answer", return_value=("Answer [1].", None))
+@patch("src.pipeline.scrape_page", return_value="Some content")
+@patch("src.pipeline.search_web", return_value=SEARCH_RESULTS[:1])
+def test_pipeline_skips_validation_when_off(
+    mock_search, mock_scrape, mock_generate, mock_validate
+):
+    """Test that no validation runs when the quality check is off."""
+    result = QuestionPipeline(validate=False).run_sync("What is meditation?")
+
+    assert result["answer"] == "Answer [1]."
+    assert result["quality_results"] is None
+    mock_validate.assert_not_called()
+
+
+@patch("src.pipeline.validate_citations")
+@patch("src.pipeline.generate_answer", return_value=("Answer [1].", None))
+@patch("src.pipeline.scrape_page", return_value="Some content")
+@patch("src.pipeline.search_web", return_value=SEARCH_RESULTS[:1])
+def test_pipeline_serves_repeat_questions_from_cache(
+    mock_search, mock_scrape, mock_generate, mock_validate
+):
+    """Test that a reworded repeat question skips search, scrape and LLM."""
+    mock_validate.return_value = {"overall_score": "Good", "citations": []}
+    first = QuestionPipeline().run_sync("What is meditation?")
+    assert first["cached"] is None
+    first["quality_results"].result(timeout=5)
+
+    second = QuestionPipeline().run_sync("what is meditation")
+    assert second["answer"] == "Answer [1]."
+    assert second["sources"] == first["sources"]
+    assert second["cached"]["question"] == "What is meditation?"
+    assert second["quality_results"].result(timeout=5) == {
+        "overall_score": "Good", "citations": []
+    }
+    assert second["telemetry"].result(timeout=5)["latency"] < 0.5
+    assert mock_search.call_count == 1
+    assert mock_scrape.call_count == 1
+    assert mock_generate.call_count == 1
+    assert mock_validate.call_count == 1
+
+
+@patch("src.pipeline.generate_answer", return_value=("Answer [1].", None))
+@patch("src.pipeline.scrape_page", return_value="Some content")
+@patch("src.pipeline.search_web", return_value=SEARCH_RESULTS[:1])
+def test_pipeline_cache_is_scoped_by_source_settings(
+    mock_search, mock_scrape, mock_generate
+):
+    """Test that answers built from other source settings are not reused."""
+    QuestionPipeline(validate=False).run_sync("What is meditation?")
+    for settings in ({"min_sources": 1}, {"max_sources": 5}, {"region": "us"}):
+        result = QuestionPipeline(validate=False, **settings).run_sync(
+            "What is meditation?"
+        )
+        assert result["cached"] is None
+    repeat = QuestionPipeline(validate=False).run_sync("What is meditation?")
+    assert repeat["cached"] is not None
+    assert mock_generate.call_count == 4
+
+
+@patch("src.pipeline.generate_answer", return_value=("Answer [1].", None))
+@patch("src.pipeline.search_web", return_value=SEARCH_RESULTS)
+def test_pipeline_keeps_first_sources_and_cancels_the_rest(
+    mock_search, mock_generate
+):
+    """Test that only K usable pages are kept and slow scrapes stop."""
+    cancelled = threading.Event()
+
+    def scrape(url, _cancel=None, _defer_retries=False):
+        if url.endswith("/4"):
+            if _cancel.wait(2.0):
+                cancelled.set()
+            return "Late content"
+        return f"Content of {url}"
+
+    with patch("src.pipeline.scrape_page", side_effect=scrape):
+        pipeline = QuestionPipeline(
+            max_sources=4, min_sources=2, validate=False, region="us"
+        )
+        result = pipeline.run_sync("What is meditation?")
+
+    assert len(result["sources"]) == 2
+    assert mock_search.call_args[0] == ("What is meditation?", 4, "us")
+    assert cancelled.wait(timeout=1)
+
+
+@patch("src.pipeline.generate_answer", return_value=("Answer [1].", None))
+@patch("src.pipeline.search_web", return_value=SEARCH_RESULTS[:2])
+def test_pipeline_schedules_retries_on_the_event_loop(
+    mock_search, mock_generate
+):
+    """Test that a retrying page waits without holding a worker thread."""
+    attempts = []
+
+    def scrape(url, _cancel=None, _defer_retries=False):
+        assert _defer_retries
+        attempts.append(url)
+        if url.endswith("/1") and attempts.count(url) < 3:
+            raise RetryLater(url)
+        return f"Content of {url}"
+
+    with patch("src.pipeline.scrape_page", side_effect=scrape):
+        with patch("src.retry.backoff_delay", return_value=0.1):
+            pipeline = QuestionPipeline(
+                max_sources=2, min_sources=2, validate=False
+            )
+            result = pipeline.run_sync("What is meditation?")
+
+    assert [s["url"] for s in result["sources"]] == [
+        "http://example.com/1", "http://example.com/2"
+    ]
+    assert attempts.count("http://example.com/1") == 3
+    assert attempts.index("http://example.com/2") == 1
+
+
+@patch("src.pipeline.generate_answer", return_value=("Answer [1].", None))
+@patch("src.pipeline.search_web", return_value=SEARCH_RESULTS)
+def test_pipeline_scrapes_sources_concurrently(mock_search, mock_generate):
+    """Test that scraping takes about as long as the slowest page."""
+    delays = {f"http://example.com/{i}": 0.1 * (i + 2) for i in range(1, 5)}
+
+    def scrape(url, _cancel=None, _defer_retries=False):
+        time.sleep(delays[url])
+        return f"Content of {url}"
+
+    with patch("src.pipeline.scrape_page", side_effect=scrape):
+        pipeline = QuestionPipeline(
+            max_sources=4, min_sources=4, validate=False
+        )
+        start = time.time()
+        result = pipeline.run_sync("What is meditation?")
+        elapsed = time.time() - start
+
+    assert len(result["sources"]) == 4
+    # Close to the slowest page (0.6s), not the sum of all four (1.8s)
+    assert elapsed < max(delays.values()) + 0.4
+
+
+@patch("src.pipeline.generate_answer", return_value=("Answer [1].", None))
+@patch("src.pipeline.search_web", return_value=SEARCH_RESULTS[:2])
+def test_pipeline_drops_pages_after_the_deadline(mock_search, mock_generate):
+    """Test that pages missing the scrape deadline are not waited for."""
+    def scrape(url, _cancel=None, _defer_retries=False):
+        if url.endswith("/2"):
+            _cancel.wait(1.0)
+        return f"Content of {url}"
+
+    with patch("src.pipeline.scrape_page", side_effect=scrape):
+        pipeline = QuestionPipeline(
+            max_sources=2, min_sources=2, scrape_deadline=0.3,
+            validate=False,
+        )
+        start = time.time()
+        result = pipeline.run_sync("What is meditation?")
+        elapsed = time.time() - start
+
+    assert [s["url"] for s in result["sources"]] == ["http://example.com/1"]
+    assert elapsed < 0.8
@@ -0,0 +1,74 @@
+"""Test src/ranking.py."""
+
+from unittest.mock import patch
+from src.ranking import PASSAGE_SEPARATOR, PassageIndex, split_passages
+
+
+def test_split_passages_keeps_sentences_together():
+    """Test that passages are made of whole sentences."""
+    text = "One two three. Four five six. Seven eight nine."
+    assert split_passages(text, max_words=6) == [
+        "One two three. Four five six.",
+        "Seven eight nine.",
+    ]
+
+
+def test_split_passages_long_sentence():
+    """Test that a sentence longer than a passage is split between words."""
+    text = " ".join(f"w{i}" for i in range(10))
+    passages = split_passages(text, max_words=4)
+    assert passages == ["w0 w1 w2 w3", "w4 w5 w6 w7", "w8 w9"]
+
+
+def test_scores_rank_relevant_passage_first():
+    """Test that BM25 ranks the passage matching the query highest."""
+    index = PassageIndex(
+        {
+            "a": "Cats sleep most of the day.",
+            "b": "Meditation reduces stress and anxiety.",
+            "c": "Stock markets closed higher today.",
+        }
+    )
+    scores = index.scores("Does meditation reduce stress?")
+    best = max(range(len(scores)), key=scores.__getitem__)
+    assert index.passages[best][0] == "b"
+    assert scores[0] == 0.0
+
+
+def test_select_returns_short_texts_unchanged():
+    """Test that texts within the budget are not cut."""
+    texts = {"a": "Short text one.", "b": "Short text two."}
+    assert PassageIndex(texts).select("text", token_budget=1000) == texts
+
+
+@patch(
+    "src.ranking.count_tokens_batch",
+    side_effect=lambda texts: [len(t.split()) for t in texts],
+)
+def test_select_keeps_relevant_passages_within_budget(mock_count):
+    """Test that only the most relevant passages are kept, in order."""
+    filler = " ".join(
+        f"Filler sentence number {i} about gardening." for i in range(40)
+    )
+    text = (
+        f"{filler} Meditation lowers blood pressure. {filler} "
+        f"Meditation also improves focus."
+    )
+    index = PassageIndex({"a": text, "b": filler}, max_words=6)
+
+    selected = index.select("meditation benefits", token_budget=30)
+
+    passages = selected["a"].split(PASSAGE_SEPARATOR)
+    assert passages[0] == "Meditation lowers blood pressure."
+    assert "Meditation also improves focus." in passages
+    # Every source keeps at least its best passage
+    assert selected["b"]
+    assert len(selected["a"]) < len(text)
+
+
+def test_select_limited_to_keys():
+    """Test selecting from a subset of the documents."""
+    index = PassageIndex({"a": "Alpha text.", "b": "Beta text."})
+    assert index.select("text", token_budget=1000, keys=["b"]) == {
+        "b": "Beta text."
+    }
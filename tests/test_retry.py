@@ -0,0 +1,25 @@
+"""Test src/retry.py."""
+
+from unittest.mock import patch
+
+from src.retry import RetryBudget, backoff_delay
+
+
+def test_backoff_delay_jitter_and_retry_after():
+    """Test the exponential growth, the jitter range and Retry-After."""
+    with patch("src.retry.random.random", return_value=0.0):
+        assert backoff_delay(2, 1.5, jitter=0.5) == 6.0
+    with patch("src.retry.random.random", return_value=1.0):
+        assert backoff_delay(2, 1.5, jitter=0.5) == 3.0
+        assert backoff_delay(0, 1.5, retry_after=4.0, jitter=0.5) == 4.0
+    assert backoff_delay(1, 1.0, jitter=0.0) == 2.0
+
+
+def test_retry_budget_limits_attempts_and_total_retries():
+    """Test that each page and the question as a whole stop retrying."""
+    budget = RetryBudget(retries=3, max_attempts=3, backoff_factor=0.1)
+    assert budget.next_delay(0) is not None
+    assert budget.next_delay(1) is not None
+    assert budget.next_delay(2) is None  # Third attempt was the last one
+    assert budget.next_delay(0) is not None
+    assert budget.next_delay(0) is None  # The question's budget is spent
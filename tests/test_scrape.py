@@ -1,8 +1,20 @@
 """Test src/scrape.py."""
 
+import threading
+import time
 import pytest
 import responses
-from src.scrape import scrape_page
+from src.http_pool import get_session
+from src.llm import build_prompt
+from src.scrape import (
+    MAX_CHARS,
+    DomainUnavailable,
+    RetryLater,
+    ScrapeCancelled,
+    detect_encoding,
+    iter_decoded_body,
+    scrape_page,
+)
 
 
 @pytest.fixture
@@ -69,6 +81,7 @@ def test_scrape_page_404_error():
     )
     result = scrape_page("http://example3435.com")
     assert result == ""  # Should return empty string on HTTP error
+    assert len(responses.calls) == 1  # Permanent errors are not retried
 
 
 def test_scrape_page_invalid_url():
@@ -88,3 +101,141 @@ def test_scrape_page_retry_timeout():
     )
     result = scrape_page("http://example.com", max_retries=2)
     assert result == ""  # Should return empty string after retries
+
+
+def test_detect_encoding():
+    """Test charset detection from headers, meta tags and defaults."""
+    assert detect_encoding("text/html; charset=ISO-8859-1", b"") == "iso8859-1"
+    assert detect_encoding(
+        "text/html", b'<html><meta charset="windows-1252">'
+    ) == "cp1252"
+    assert detect_encoding("text/html", b"<html>plain ascii</html>") == "utf-8"
+
+
+@responses.activate
+def test_iter_decoded_body_byte_budget():
+    """Test that the body is decoded once and cut at the byte budget."""
+    body = "<p>caf\u00e9</p>" * 100
+    responses.add(
+        responses.GET,
+        "http://example.com/big",
+        body=body.encode("utf-8"),
+        status=200,
+        headers={"Content-Type": "text/html; charset=utf-8"},
+    )
+    response = get_session().get("http://example.com/big", stream=True)
+    text = "".join(iter_decoded_body(response, max_bytes=30))
+    assert text.startswith("<p>caf\u00e9</p>")
+    assert len(text.encode("utf-8")) <= 30
+
+
+@responses.activate
+def test_scrape_page_large_page_truncated():
+    """Test that long pages are capped and still match the full extraction."""
+    paragraphs = "".join(
+        f"<p>Sentence number {i} of a very long article.</p>"
+        for i in range(2000)
+    )
+    responses.add(
+        responses.GET,
+        "http://example.com/long",
+        body=f"<html><body><article class='content'>{paragraphs}</article>"
+        "</body></html>",
+        status=200,
+        headers={"Content-Type": "text/html"},
+    )
+    result = scrape_page("http://example.com/long")
+    assert result.startswith("Sentence number 0 of a very long article.")
+    assert len(result) == MAX_CHARS + len("...")
+
+
+@responses.activate
+def test_scrape_page_keeps_late_passages_for_ranking():
+    """Test that text deep in a page can still be picked for the prompt."""
+    filler = "".join(
+        f"<p>Paragraph {i} is about the history of gardening tools.</p>"
+        for i in range(300)
+    )
+    responses.add(
+        responses.GET,
+        "http://example.com/deep",
+        body=f"<html><body><article>{filler}<p>Meditation lowers cortisol "
+        "levels in adults.</p></article></body></html>",
+        status=200,
+        headers={"Content-Type": "text/html"},
+    )
+    text = scrape_page("http://example.com/deep")
+    assert text.index("cortisol") > 8000
+
+    sources = [{"title": "Deep", "url": "http://example.com/deep"}]
+    prompt = build_prompt(
+        "Does meditation lower cortisol?", sources,
+        {"http://example.com/deep": text},
+    )
+    assert "Meditation lowers cortisol" in prompt
+
+
+@responses.activate
+def test_scrape_page_cancelled(mock_html):
+    """Test that a cancelled scrape stops without caching an empty page."""
+    responses.add(
+        responses.GET,
+        "http://example.com/cancel",
+        body=mock_html,
+        status=200,
+        headers={"Content-Type": "text/html"},
+    )
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(ScrapeCancelled):
+        scrape_page("http://example.com/cancel", _cancel=cancel)
+    assert len(responses.calls) == 0
+    assert "main content" in scrape_page("http://example.com/cancel")
+
+
+@responses.activate
+def test_scrape_page_retry_after_opens_circuit():
+    """Test that a long Retry-After skips the domain instead of waiting."""
+    responses.add(
+        responses.GET,
+        "http://busy.example.com/a",
+        status=429,
+        headers={"Retry-After": "120"},
+    )
+    start = time.time()
+    assert scrape_page("http://busy.example.com/a") == ""
+    assert time.time() - start < 1
+    with pytest.raises(DomainUnavailable):
+        scrape_page("http://busy.example.com/b")
+    assert len(responses.calls) == 1
+
+
+@responses.activate
+def test_scrape_page_retries_server_errors(mock_html):
+    """Test that a 503 is retried and the page is then scraped."""
+    responses.add(responses.GET, "http://flaky.example.com", status=503)
+    responses.add(
+        responses.GET,
+        "http://flaky.example.com",
+        body=mock_html,
+        status=200,
+        headers={"Content-Type": "text/html"},
+    )
+    result = scrape_page("http://flaky.example.com", backoff_factor=0.01)
+    assert "main content" in result
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_scrape_page_defers_retries():
+    """Test that a transient failure is handed back instead of waited out."""
+    responses.add(
+        responses.GET,
+        "http://busy.example.com",
+        status=429,
+        headers={"Retry-After": "2"},
+    )
+    with pytest.raises(RetryLater) as error:
+        scrape_page("http://busy.example.com", _defer_retries=True)
+    assert error.value.retry_after == 2.0
+    assert len(responses.calls) == 1
@@ -1,5 +1,7 @@
 """Test src/search.py."""
 
+import json
+
 import pytest
 import responses
 from src.search import search_web
@@ -27,6 +29,9 @@ def test_search_web_success():
         assert len(results) == 2
         assert results[0]["title"] == "Result 1"
         assert results[0]["url"] == "http://example.com/1"
+        # The repeat query is answered from the cache
+        assert search_web("Test  Query") == results
+        assert len(responses.calls) == 1
 
 
 @responses.activate
@@ -58,3 +63,45 @@ def test_search_web_error():
         mp.setenv("URL", "https://google.serper.dev/search")
         results = search_web("test streamlit")
         assert results == []
+
+
+@responses.activate
+def test_search_web_error_not_cached():
+    """Test that a failed search is retried on the next call."""
+    responses.add(
+        responses.POST, "https://google.serper.dev/search", status=500
+    )
+    responses.add(
+        responses.POST,
+        "https://google.serper.dev/search",
+        json={"organic": [{"title": "R", "link": "http://example.com"}]},
+        status=200,
+    )
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("SEARCH_API_KEY", "test_key")
+        assert search_web("test retry") == []
+        assert search_web("test retry") == [
+            {"title": "R", "url": "http://example.com"}
+        ]
+
+
+@responses.activate
+def test_search_web_region_and_count():
+    """Test that the region and result count are sent and applied."""
+    responses.add(
+        responses.POST,
+        "https://google.serper.dev/search",
+        json={
+            "organic": [
+                {"title": f"R{i}", "link": f"http://example.com/{i}"}
+                for i in range(12)
+            ]
+        },
+        status=200,
+    )
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("SEARCH_API_KEY", "test_key")
+        results = search_web("test region", num_results=8, region="us")
+    assert len(results) == 8
+    body = json.loads(responses.calls[0].request.body)
+    assert body == {"q": "test region", "gl": "us", "num": 8}
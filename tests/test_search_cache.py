@@ -0,0 +1,71 @@
+"""Test src/search_cache.py."""
+
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from src.search_cache import SearchCache
+
+
+def test_search_cache_coalesces_concurrent_misses():
+    """Test that simultaneous identical lookups make one upstream call."""
+    cache = SearchCache()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return [{"title": "R", "url": "http://example.com"}]
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get("q", fetch)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == 8
+    assert all(r == results[0] for r in results)
+
+
+def test_search_cache_serves_stale_while_revalidating():
+    """Test that stale entries are returned at once and refreshed."""
+    cache = SearchCache(ttl=10, stale=100)
+    refreshed = threading.Event()
+
+    def refresh():
+        refreshed.set()
+        return ["new"]
+
+    now = [1000.0]
+    with patch("src.search_cache.time.time", side_effect=lambda: now[0]):
+        cache.get("q", lambda: ["old"])
+        now[0] = 1050.0
+        assert cache.get("q", refresh) == ["old"]
+        assert refreshed.wait(timeout=5)
+        for _ in range(50):
+            if cache.get("q", lambda: ["unused"]) == ["new"]:
+                break
+            time.sleep(0.01)
+        assert cache.get("q", lambda: ["unused"]) == ["new"]
+
+
+def test_search_cache_expires_and_does_not_cache_errors():
+    """Test that entries past the stale window and failures are refetched."""
+    cache = SearchCache(ttl=10, stale=5)
+    with patch("src.search_cache.time.time", return_value=1000.0):
+        cache.get("q", lambda: ["old"])
+    with patch("src.search_cache.time.time", return_value=1020.0):
+        assert cache.get("q", lambda: ["new"]) == ["new"]
+
+    def fail():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        cache.get("other", fail)
+    assert cache.get("other", lambda: ["ok"]) == ["ok"]
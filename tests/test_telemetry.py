@@ -1,6 +1,18 @@
 """Test src/telementry.py"""
 
-from src.telemetry import count_tokens, track_telemetry
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from src import telemetry
+from src.telemetry import (
+    TelemetryRecorder,
+    count_tokens,
+    count_tokens_batch,
+    get_tokenizer,
+    track_telemetry,
+)
 
 
 def test_count_tokens():
@@ -36,3 +48,116 @@ def test_track_telemetry():
     assert telemetry["source_count"] == 1
     assert telemetry["question_length"] == len(question)
     assert telemetry["answer_length"] == len(answer)
+
+
+def test_count_tokens_batch_matches_single():
+    """Test that batched counts match counting one text at a time."""
+    texts = ["First text.", "", "A somewhat longer second text here."]
+    assert count_tokens_batch(texts) == [count_tokens(t) for t in texts]
+
+
+@patch("src.telemetry.get_tokenizer")
+def test_count_tokens_batch_memoized(mock_tokenizer):
+    """Test that counts are memoized by content and encoded in one batch."""
+    encoder = mock_tokenizer.return_value
+    encoder.encode_ordinary_batch.side_effect = lambda texts, num_threads: [
+        t.split() for t in texts
+    ]
+    text = "memo test text with seven words here"
+
+    assert count_tokens_batch([text, text, "two words"]) == [7, 7, 2]
+    assert count_tokens_batch([text]) == [7]
+
+    # Duplicates share one encoding and cached texts are not encoded again
+    encoder.encode_ordinary_batch.assert_called_once()
+    assert encoder.encode_ordinary_batch.call_args[0][0] == [
+        text, "two words"
+    ]
+
+
+def test_track_telemetry_estimate_mode(monkeypatch):
+    """Test telemetry with the tokenizer-free estimator."""
+    monkeypatch.setattr("src.telemetry.TOKEN_COUNT_MODE", "estimate")
+    sources = [{"title": "Source 1", "url": "http://example.com"}]
+    scraped_texts = {"http://example.com": "Meditation reduces stress."}
+
+    telemetry = track_telemetry("What is meditation?", sources, scraped_texts)
+    assert telemetry["token_count_mode"] == "estimate"
+    assert telemetry["input_tokens"] == round(len("What is meditation?") / 4)
+    assert telemetry["source_tokens"] > 0
+    assert "token_estimate_error" in telemetry
+
+
+def test_recorder_computes_in_background():
+    """Test that recorded requests resolve to telemetry and aggregates."""
+    recorder = TelemetryRecorder()
+    sources = [{"title": "Source 1", "url": "http://example.com"}]
+    scraped_texts = {"http://example.com": "Meditation reduces stress."}
+
+    future = recorder.record(
+        "What is meditation?", sources, scraped_texts, "Answer [1].",
+        latency=1.5,
+    )
+    telemetry = future.result(timeout=5)
+
+    assert telemetry["latency"] == 1.5
+    assert telemetry["source_tokens"] > 0
+    assert recorder.flush(timeout=5)
+    summary = recorder.summary()
+    assert summary["requests"] == 1
+    assert summary["total_tokens"] == telemetry["total_tokens"]
+    assert summary["mean_latency"] == 1.5
+
+
+@patch("src.telemetry.track_telemetry", return_value={})
+def test_recorder_queues_request_data_without_copying(mock_track):
+    """Test that the request's sources and texts are shared, not copied."""
+    recorder = TelemetryRecorder()
+    sources = [{"title": "Source 1", "url": "http://example.com"}]
+    scraped_texts = {"http://example.com": "Meditation reduces stress."}
+
+    recorder.record("q", sources, scraped_texts).result(timeout=5)
+
+    args = mock_track.call_args[0]
+    assert args[1] is sources
+    assert args[2] is scraped_texts
+
+
+@patch("src.telemetry.track_telemetry")
+def test_recorder_drops_when_full(mock_track):
+    """Test that events are dropped instead of blocking when backed up."""
+    release = threading.Event()
+    mock_track.side_effect = lambda *args: release.wait(5) and {}
+    recorder = TelemetryRecorder(max_pending=1)
+
+    first = recorder.record("q1", [], {})
+    while not first.running():
+        time.sleep(0.01)
+    recorder.record("q2", [], {})  # Waits in the queue
+    dropped = recorder.record("q3", [], {})
+
+    with pytest.raises(RuntimeError, match="queue is full"):
+        dropped.result(timeout=1)
+    release.set()
+    assert recorder.flush(timeout=5)
+    assert recorder.summary()["dropped"] == 1
+
+
+def test_get_tokenizer_retries_after_cool_down(monkeypatch):
+    """Test that a failed tokenizer load is retried after the cool-down."""
+    monkeypatch.setattr(telemetry, "_tokenizer", None)
+    monkeypatch.setattr(telemetry, "_tokenizer_error", None)
+    encoder = object()
+    with patch(
+        "src.telemetry.tiktoken.get_encoding",
+        side_effect=[OSError("offline"), encoder],
+    ) as mock_load:
+        with patch("src.telemetry.time.monotonic", return_value=1000.0):
+            with pytest.raises(OSError):
+                get_tokenizer()
+            with pytest.raises(OSError):
+                get_tokenizer()  # Remembered, not loaded again
+        assert mock_load.call_count == 1
+        with patch("src.telemetry.time.monotonic", return_value=1061.0):
+            assert get_tokenizer() is encoder
+        assert mock_load.call_count == 2
@@ -0,0 +1,56 @@
+"""Test src/token_estimate.py."""
+
+from src.token_estimate import SCRIPT_CLASSES, TokenEstimator, script_counts
+
+
+def _class_index(name):
+    return [c[0] for c in SCRIPT_CLASSES].index(name)
+
+
+def test_script_counts_per_text():
+    """Test that characters are counted per text and script class."""
+    counts = script_counts(["abc", "", "日本語", "привет😀"])
+    assert counts.shape == (4, len(SCRIPT_CLASSES))
+    assert counts[0, _class_index("ascii")] == 3
+    assert counts[1].sum() == 0
+    assert counts[2, _class_index("cjk")] == 3
+    assert counts[3, _class_index("greek_cyrillic")] == 6
+    assert counts[3, _class_index("astral")] == 1
+
+
+def test_estimate_english_text():
+    """Test that plain English is estimated at about four chars a token."""
+    estimator = TokenEstimator(exact_counter=lambda texts: [], sample_every=0)
+    text = "Meditation is a practice that reduces stress. " * 10
+    assert estimator.estimate([text, ""]) == [round(len(text) / 4), 0]
+
+
+def test_estimate_samples_error_and_refits():
+    """Test that sampled exact counts measure the error and refit rates."""
+    calls = []
+
+    def exact_counter(texts):
+        calls.append(texts)
+        return [len(text) // 2 for text in texts]  # Two chars per token
+
+    estimator = TokenEstimator(exact_counter, sample_every=2, max_error=0.1)
+    texts = ["x" * 100, "y" * 300]
+
+    estimator.estimate(texts)
+    estimator.estimate(texts)  # Not sampled
+    assert len(calls) == 1
+
+    # The default rate was 50% off, so the model was refitted
+    stats = estimator.error_stats()
+    assert stats["samples"] == 2
+    assert stats["mean_error"] < 0.01
+    assert estimator.estimate(texts) == [50, 150]
+
+
+def test_error_stats_without_samples():
+    """Test error stats before any sample was taken."""
+    estimator = TokenEstimator(exact_counter=lambda texts: [], sample_every=0)
+    estimator.estimate(["text"])
+    assert estimator.error_stats() == {
+        "samples": 0, "mean_error": None, "max_error": None
+    }
@@ -0,0 +1,76 @@
+"""Test src/tracing.py."""
+
+import json
+
+import pytest
+from src.concurrency import context_executor
+from src.tracing import (
+    current_span,
+    export_trace,
+    span,
+    to_chrome_trace,
+    traced_call,
+)
+
+
+def test_spans_nest():
+    """Test that spans opened inside another span become its children."""
+    with span("question", question="q") as root:
+        with span("search"):
+            pass
+        with span("scrape", url="http://example.com") as scrape:
+            scrape.set(status=200)
+    assert current_span() is None
+
+    assert [child.name for child in root.children] == ["search", "scrape"]
+    assert root.children[1].attrs == {
+        "url": "http://example.com", "status": 200
+    }
+    assert root.duration >= root.children[1].duration >= 0
+
+
+def test_span_records_errors():
+    """Test that an exception is recorded on the span and re-raised."""
+    with span("question") as root:
+        with pytest.raises(ValueError):
+            with span("scrape"):
+                raise ValueError("boom")
+    assert "boom" in root.children[0].attrs["error"]
+
+
+def test_spans_propagate_to_worker_threads():
+    """Test that spans opened on pool threads attach to the submitter."""
+    executor = context_executor(2, "test")
+    with span("question") as root:
+        futures = [
+            executor.submit(traced_call("scrape", lambda: None, url=str(i)))
+            for i in range(2)
+        ]
+        for future in futures:
+            future.result()
+    executor.shutdown()
+
+    assert sorted(c.attrs["url"] for c in root.children) == ["0", "1"]
+    assert all(c.thread.startswith("test") for c in root.children)
+
+
+def test_chrome_trace_export(tmp_path):
+    """Test the Chrome trace event format and both export formats."""
+    with span("question") as root:
+        with span("search"):
+            pass
+
+    trace = to_chrome_trace(root)
+    events = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+    assert [e["name"] for e in events] == ["question", "search"]
+    assert events[0]["ts"] == 0
+    assert events[1]["ts"] >= 0 and events[1]["dur"] >= 0
+
+    export_trace(root, str(tmp_path / "chrome.json"), "chrome")
+    export_trace(root, str(tmp_path / "tree.json"), "json")
+    tree = json.loads((tmp_path / "tree.json").read_text())
+    assert tree["children"][0]["name"] == "search"
+    assert "traceEvents" in json.loads((tmp_path / "chrome.json").read_text())
+
+    with pytest.raises(ValueError, match="Unknown trace format"):
+        export_trace(root, str(tmp_path / "x.json"), "xml")